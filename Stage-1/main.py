@@ -1,4 +1,10 @@
+import argparse
+import csv
+import sys
+import time
 from pathlib import Path
+from typing import Iterable, List, Optional, TextIO
+
 from library import Library, Book
 
 
@@ -9,10 +15,20 @@ def prompt(prompt_text: str) -> str:
         return ""
 
 
+def warn_unindexed(lib: Library, file: TextIO = sys.stdout) -> None:
+    if lib.unindexed_records:
+        print(
+            f"Uyarı: {len(lib.unindexed_records)} kayıt geçersiz veya yinelenen ISBN nedeniyle "
+            "yüklenemedi; dosyada olduğu gibi korunuyor.",
+            file=file,
+        )
+
+
 def main() -> None:
     storage = Path(__file__).with_name("library.json")
     lib = Library(storage)
     lib.load_books()
+    warn_unindexed(lib)
 
     menu = (
         "\n=== Kütüphane Uygulaması ===\n"
@@ -69,7 +85,118 @@ def main() -> None:
             print("Geçersiz seçim. Lütfen 1-5 arasında bir değer girin.")
 
 
-if __name__ == "__main__":
-    main()
+def run_batch(
+    lib: Library, lines: Iterable[str], *, save_every: int = 0, out: TextIO = sys.stdout
+) -> dict:
+    """CSV işlemlerini tek geçişte uygular; kütüphane bellekte tutulur ve toplu kaydedilir.
+
+    Satır biçimleri: `add,başlık,yazar,isbn` | `remove,isbn` | `find,isbn`.
+    Boş satırlar ve `#` ile başlayanlar atlanır. Dosya sonda (veya `save_every` > 0 ise
+    her N işlemde bir) yazılır. Her satır için `satır<TAB>OK|ERROR<TAB>işlem<TAB>mesaj` basılır.
+    """
+    previous_autosave = lib.autosave
+    lib.autosave = False
+    stats = {"total": 0, "ok": 0, "error": 0}
+    dirty = False
+    started = time.perf_counter()
+    try:
+        reader = csv.reader(lines)
+        start = 1
+        for row in reader:
+            # Tırnaklı alanlar birden çok satıra yayılabilir: kaydın başladığı satır raporlanır
+            lineno, start = start, reader.line_num + 1
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            stats["total"] += 1
+            op, args = row[0].strip().lower(), [a.strip() for a in row[1:]]
+            try:
+                if op == "add" and len(args) == 3:
+                    book = Book(title=args[0], author=args[1], isbn=args[2])
+                    lib.add_book(book)
+                    dirty = True
+                    message = f"Eklendi: {book}"
+                elif op == "remove" and len(args) == 1:
+                    lib.remove_book(args[0])
+                    dirty = True
+                    message = "Kitap silindi."
+                elif op == "find" and len(args) == 1:
+                    book = lib.find_book(args[0])
+                    if book is None:
+                        raise ValueError("Kitap bulunamadı.")
+                    message = str(book)
+                else:
+                    raise ValueError(f"Geçersiz işlem: {','.join(row)}")
+            except ValueError as e:
+                stats["error"] += 1
+                print(f"{lineno}\tERROR\t{op}\t{e}", file=out)
+            else:
+                stats["ok"] += 1
+                print(f"{lineno}\tOK\t{op}\t{message}", file=out)
+
+            if save_every and dirty and stats["total"] % save_every == 0:
+                lib.save_books()
+                dirty = False
+    finally:
+        # Yarıda kesilse bile o ana kadarki değişiklikler kaybolmasın
+        if dirty:
+            lib.save_books()
+        lib.autosave = previous_autosave
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def _non_negative_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"geçersiz tam sayı: {value!r}")
+    if number < 0:
+        raise argparse.ArgumentTypeError("0 veya pozitif bir tam sayı olmalı")
+    return number
 
 
+def batch_main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="main.py batch", description="İşlemleri etkileşimsiz olarak CSV'den uygular."
+    )
+    parser.add_argument("ops", nargs="?", default="-", help="İşlem dosyası (varsayılan: stdin)")
+    parser.add_argument(
+        "--save-every",
+        type=_non_negative_int,
+        default=0,
+        metavar="N",
+        help="Her N işlemde bir kaydet (varsayılan: yalnızca sonda)",
+    )
+    parser.add_argument("--storage", default=str(Path(__file__).with_name("library.json")))
+    args = parser.parse_args(argv)
+
+    ops: TextIO = sys.stdin
+    if args.ops != "-":
+        try:
+            ops = open(args.ops, encoding="utf-8", newline="")
+        except OSError as e:
+            print(f"İşlem dosyası açılamadı: {e}", file=sys.stderr)
+            return 2
+
+    lib = Library(args.storage)
+    lib.load_books()
+    warn_unindexed(lib, file=sys.stderr)
+    try:
+        stats = run_batch(lib, ops, save_every=args.save_every)
+    finally:
+        if ops is not sys.stdin:
+            ops.close()
+
+    rate = stats["total"] / stats["seconds"] if stats["seconds"] > 0 else float("inf")
+    print(
+        f"{stats['total']} işlem ({stats['ok']} başarılı, {stats['error']} hatalı) "
+        f"{stats['seconds']:.3f} sn, {rate:.0f} işlem/sn",
+        file=sys.stderr,
+    )
+    return 1 if stats["error"] else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(batch_main(sys.argv[2:]))
+    main()
@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 import sys
 
@@ -6,7 +7,9 @@ CURRENT_DIR = Path(__file__).parent
 if str(CURRENT_DIR) not in sys.path:
     sys.path.insert(0, str(CURRENT_DIR))
 
-from library import Book, Library
+import pytest
+
+from library import Book, Library, canonical_isbn
 
 
 def test_book_str_format():
@@ -58,3 +61,91 @@ def test_list_and_find(tmp_path: Path):
     assert lib.find_book("9780345339683").title == "The Hobbit"
 
 
+def test_isbn_canonicalization(tmp_path: Path):
+    assert canonical_isbn("978-0199535675") == "9780199535675"
+    assert canonical_isbn("0-441-01359-7") == "9780441013593"
+    with pytest.raises(ValueError):
+        canonical_isbn("9780441013594")
+
+    lib = Library(tmp_path / "lib.json")
+    lib.load_books()
+    lib.add_book(Book("Dune", "Frank Herbert", "978-0-441-01359-3"))
+    assert lib.find_book("0441013597").title == "Dune"
+    assert lib.list_books()[0].isbn == "9780441013593"
+    with pytest.raises(ValueError):
+        lib.add_book(Book("Dune", "Frank Herbert", "0441013597"))
+
+
+def test_invalid_isbn_records_are_kept_on_save(tmp_path: Path):
+    store = tmp_path / "lib.json"
+    good = {"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593"}
+    bad = {"title": "Bozuk", "author": "X", "isbn": "123"}
+    dup = {"title": "Dune (kopya)", "author": "Frank Herbert", "isbn": "0441013597"}
+    store.write_text(json.dumps([good, bad, dup]), encoding="utf-8")
+
+    lib = Library(store)
+    lib.load_books()
+    assert [b.title for b in lib.list_books()] == ["Dune"]
+    assert lib.unindexed_records == [bad, dup]
+
+    lib.add_book(Book("The Hobbit", "J.R.R. Tolkien", "9780345339683"))
+    saved = json.loads(store.read_text(encoding="utf-8"))
+    assert bad in saved and dup in saved
+    assert len(saved) == 4
+
+
+def test_batch_applies_ops_and_saves_once(tmp_path: Path, monkeypatch):
+    import io
+    import main
+
+    store = tmp_path / "lib.json"
+    lib = Library(store)
+    lib.load_books()
+    saves = {"count": 0}
+    original_save = lib.save_books
+
+    def counting_save():
+        saves["count"] += 1
+        original_save()
+
+    monkeypatch.setattr(lib, "save_books", counting_save)
+
+    ops = [
+        "add,Dune,Frank Herbert,9780441013593",
+        'add,"The Hobbit, or There and Back Again",J.R.R. Tolkien,9780345339683',
+        "# yorum",
+        "find,0441013597",
+        "remove,9780441013593",
+        "remove,9780441013593",
+        "bogus,1",
+    ]
+    out = io.StringIO()
+    stats = main.run_batch(lib, ops, out=out)
+
+    assert (stats["total"], stats["ok"], stats["error"]) == (6, 4, 2)
+    assert saves["count"] == 1
+    lines = out.getvalue().splitlines()
+    assert lines[2].startswith("4\tOK\tfind\tDune")
+    assert lines[4].startswith("6\tERROR\tremove")
+    assert lib.autosave is True
+
+    lib2 = Library(store)
+    lib2.load_books()
+    assert [b.title for b in lib2.list_books()] == ["The Hobbit, or There and Back Again"]
+
+
+def test_batch_reports_start_line_and_rejects_bad_arguments(tmp_path: Path, capsys):
+    import io
+    import main
+
+    lib = Library(tmp_path / "lib.json")
+    ops = io.StringIO('add,"Çok\nsatırlı",Yazar,9780441013593\nbogus,1\n')
+    out = io.StringIO()
+    main.run_batch(lib, ops, out=out)
+    results = [line.split("\t")[:2] for line in out.getvalue().splitlines() if "\t" in line]
+    assert results == [["1", "OK"], ["3", "ERROR"]]
+
+    assert main.batch_main([str(tmp_path / "yok.csv"), "--storage", str(tmp_path / "x.json")]) == 2
+    assert "açılamadı" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        main.batch_main(["--save-every", "-1"])
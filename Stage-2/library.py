@@ -3,6 +3,7 @@ Stage-2: Open Library API ile ISBN'den kitap bilgisi çekerek ekleme
 
 Bu aşamada Stage-1'in tüm yetenekleri korunur. Ek olarak:
 - add_book_by_isbn(isbn): Open Library'den başlık ve yazar(lar)ı çekip ekler
+- ISBN'ler kanonik ISBN-13 olarak saklanır ve int anahtarlı indekste tutulur
 
 Not: Open Library, sık isteklerde User-Agent header'ı talep eder.
 Bkz: https://openlibrary.org/developers/api
@@ -11,8 +12,9 @@ Bkz: https://openlibrary.org/developers/api
 from __future__ import annotations
 
 import json
+import re
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import httpx
 
@@ -21,6 +23,39 @@ DEFAULT_UA = (
     "GlobalAIHub-Python202-Stage2/1.0 (+contact@example.com)"
 )
 
+_ISBN_SEPARATORS = re.compile(r"[\s\-]")
+
+
+def canonical_isbn(isbn: str) -> str:
+    """ISBN'i kanonik 13 haneli biçime getirir.
+
+    Tire/boşluk ayraçları atılır, kontrol hanesi doğrulanır ve ISBN-10 değerleri
+    ISBN-13'e (978 önekiyle) çevrilir. Geçersiz girdide ValueError yükseltir.
+    """
+    digits = _ISBN_SEPARATORS.sub("", str(isbn)).upper()
+    if len(digits) == 10 and digits[:9].isdigit() and (digits[9].isdigit() or digits[9] == "X"):
+        total = sum((10 - i) * int(c) for i, c in enumerate(digits[:9]))
+        total += 10 if digits[9] == "X" else int(digits[9])
+        if total % 11 != 0:
+            raise ValueError(f"Geçersiz ISBN (kontrol hanesi): {isbn}")
+        body = "978" + digits[:9]
+        return body + _isbn13_check_digit(body)
+    if len(digits) == 13 and digits.isdigit():
+        if _isbn13_check_digit(digits[:12]) != digits[12]:
+            raise ValueError(f"Geçersiz ISBN (kontrol hanesi): {isbn}")
+        return digits
+    raise ValueError(f"Geçersiz ISBN: {isbn}")
+
+
+def isbn_key(isbn: str) -> int:
+    """Kanonik ISBN-13'ü birincil indeks anahtarı olarak int'e paketler."""
+    return int(canonical_isbn(isbn))
+
+
+def _isbn13_check_digit(first12: str) -> str:
+    total = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
 
 class Book:
     """Kütüphanedeki tek bir kitabı temsil eder."""
@@ -44,61 +79,90 @@ class Book:
 class Library:
     """Kitap koleksiyonunu yöneten sınıf. Verileri JSON dosyasında kalıcı tutar."""
 
-    def __init__(self, storage_path: str | Path = "library.json"):
+    def __init__(self, storage_path: str | Path = "library.json", *, autosave: bool = True):
         self.storage_path = Path(storage_path)
-        self._books: List[Book] = []
+        # False ise değişiklikler yalnızca save_books() çağrıldığında yazılır (toplu işlemler)
+        self.autosave = autosave
+        # Birincil indeks: isbn_key(isbn) -> Book (ekleme sırası korunur)
+        self._books: Dict[int, Book] = {}
+        # Geçersiz veya yinelenen ISBN'li kayıtlar indekse alınamaz; veri kaybı olmasın diye
+        # ham halleriyle tutulur ve save_books() ile dosyaya aynen geri yazılır
+        self.unindexed_records: List[dict] = []
 
     # Persistans yardımcıları
     def load_books(self) -> None:
+        self.unindexed_records = []
         if not self.storage_path.exists():
-            self._books = []
+            self._books = {}
             return
         try:
             raw = json.loads(self.storage_path.read_text(encoding="utf-8"))
             if not isinstance(raw, list):
-                self._books = []
+                self._books = {}
                 return
-            self._books = [Book.from_dict(item) for item in raw]
+            books: Dict[int, Book] = {}
+            unindexed: List[dict] = []
+            for item in raw:
+                book = Book.from_dict(item)
+                try:
+                    key = isbn_key(book.isbn)
+                except ValueError:
+                    unindexed.append(item)
+                    continue
+                if key in books:
+                    unindexed.append(item)
+                    continue
+                book.isbn = str(key)
+                books[key] = book
+            self._books = books
+            self.unindexed_records = unindexed
         except Exception:
-            self._books = []
+            self._books = {}
 
     def save_books(self) -> None:
-        data = [b.to_dict() for b in self._books]
+        data = [b.to_dict() for b in self._books.values()] + self.unindexed_records
         self.storage_path.write_text(
             json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
         )
 
+    def _persist(self) -> None:
+        if self.autosave:
+            self.save_books()
+
     # Stage-1 metodları
     def add_book(self, book: Book) -> None:
-        if any(existing.isbn == book.isbn for existing in self._books):
+        key = isbn_key(book.isbn)
+        if key in self._books:
             raise ValueError(f"ISBN already exists: {book.isbn}")
-        self._books.append(book)
-        self.save_books()
+        book.isbn = str(key)
+        self._books[key] = book
+        self._persist()
 
     def remove_book(self, isbn: str) -> None:
-        original_len = len(self._books)
-        self._books = [b for b in self._books if b.isbn != isbn]
-        if len(self._books) == original_len:
+        if self._books.pop(isbn_key(isbn), None) is None:
             raise ValueError(f"Book not found for ISBN: {isbn}")
-        self.save_books()
+        self._persist()
 
     def list_books(self) -> List[Book]:
-        return list(self._books)
+        return list(self._books.values())
 
     def find_book(self, isbn: str) -> Optional[Book]:
-        for book in self._books:
-            if book.isbn == isbn:
-                return book
-        return None
+        try:
+            return self._books.get(isbn_key(isbn))
+        except ValueError:
+            return None
 
     # Stage-2: Open Library entegrasyonu
     def add_book_by_isbn(self, isbn: str, *, user_agent: str = DEFAULT_UA) -> Book:
         """Open Library API'den verileri çekerek kitabı ekler.
 
-        Başarısızlık durumunda ValueError yükseltir.
+        Başarısızlık durumunda ValueError yükseltir. ISBN önce kanonikleştirilir; böylece
+        eşdeğer ISBN'ler (ör. ISBN-10 ve ISBN-13) için upstream'e tekrar gidilmez.
         """
-        if any(existing.isbn == isbn for existing in self._books):
+        key = isbn_key(isbn)
+        if key in self._books:
             raise ValueError(f"ISBN already exists: {isbn}")
+        isbn = str(key)
 
         try:
             title, authors = self._fetch_book_metadata(isbn, user_agent=user_agent)
@@ -107,8 +171,8 @@ class Library:
 
         author_str = ", ".join(authors) if authors else "Unknown"
         book = Book(title=title, author=author_str, isbn=isbn)
-        self._books.append(book)
-        self.save_books()
+        self._books[key] = book
+        self._persist()
         return book
 
     @staticmethod
@@ -93,3 +93,57 @@ def test_add_book_by_isbn_network_error(monkeypatch, tmp_path: Path):
         assert False, "Beklenen hata yükseltilmedi"
     except ValueError as e:
         assert "Ağ hatası" in str(e)
+
+
+def test_add_book_by_isbn_equivalent_isbn_skips_upstream(monkeypatch, tmp_path: Path):
+    store = tmp_path / "lib.json"
+    lib = Library(store)
+    lib.add_book(Book("Dune", "Frank Herbert", "9780441013593"))
+
+    import httpx
+
+    def fake_get(url, timeout=10, headers=None):
+        raise AssertionError("upstream çağrılmamalı")
+
+    monkeypatch.setattr(httpx, "get", fake_get)
+
+    try:
+        lib.add_book_by_isbn("0-441-01359-7")
+        assert False, "Beklenen hata yükseltilmedi"
+    except ValueError as e:
+        assert "already exists" in str(e)
+
+
+def test_batch_add_by_isbn(monkeypatch, tmp_path: Path):
+    import io
+    import main
+
+    store = tmp_path / "lib.json"
+    lib = Library(store)
+
+    class MockResponse:
+        def __init__(self, status_code, payload):
+            self.status_code = status_code
+            self._payload = payload
+
+        def json(self):
+            return self._payload
+
+    def fake_get(url, timeout=10, headers=None):
+        if "/isbn/" in url:
+            return MockResponse(200, {"title": "Dune", "by_statement": "Frank Herbert"})
+        return MockResponse(404, {})
+
+    import httpx
+    monkeypatch.setattr(httpx, "get", fake_get)
+
+    out = io.StringIO()
+    stats = main.run_batch(
+        lib, ["isbn,9780441013593", "isbn,0441013597", "find,9780441013593"], out=out
+    )
+    assert (stats["ok"], stats["error"]) == (2, 1)
+    assert "already exists" in out.getvalue().splitlines()[1]
+
+    lib2 = Library(store)
+    lib2.load_books()
+    assert lib2.find_book("9780441013593").author == "Frank Herbert"
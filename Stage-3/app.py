@@ -2,133 +2,853 @@
 Stage-3: FastAPI ile Kendi API'n
 
 Uç noktalar:
-- GET    /books                 → tüm kitapları listele (sayfalı)
+- GET    /books                 → kitapları listele (sayfalı; sort/order/author/title_prefix)
 - GET    /books/{isbn}          → ISBN'e göre tek kitap
 - POST   /books                 → body ile kitap ekle
 - POST   /books/isbn/{isbn}     → Open Library'den çekerek ekle
 - PUT    /books/{isbn}          → kitabı güncelle (başlık/yazar)
 - DELETE /books/{isbn}          → kitabı sil
+- GET    /books/changes         → since=<version> sonrası değişiklikler (long-poll: wait)
+- GET    /books/changes/stream  → değişiklik akışı (Server-Sent Events)
+- GET    /ready                 → kitaplar yüklendi mi (readiness)
 
-Kalıcı depolama: Stage-3/library.json
+Kalıcı depolama: Stage-3/library.json (LIBRARY_STORAGE ile değiştirilebilir).
+LIBRARY_SHARDS=K ile kitaplar ISBN anahtarına göre K shard dosyasına (library.shards/)
+bölünür; bir değişiklik yalnızca kendi shard'ını yazar, yükleme süreç havuzunda paraleldir.
+Soğuk başlangıç: doğrulanmış kayıtlar kaynak dosyanın SHA-256 özetiyle anahtarlanan
+bir snapshot'a (library.json.snapshot) yazılır; özet eşleşirse Pydantic doğrulaması
+atlanır. LIBRARY_LAZY_LOAD=1 ile yükleme import yerine lifespan'da arka planda yapılır.
+ISBN'ler kanonik ISBN-13 biçimine getirilir (ayraçsız, kontrol hanesi doğrulanmış,
+ISBN-10 → ISBN-13); birincil indeks bu değerin int'e paketlenmiş hali ile anahtarlanır.
+Kabul kontrolü: LIBRARY_ADMISSION=1 ile istemci başına token bucket hız sınırı ve
+upstream/yerel route'lar için ayrı eşzamanlılık sınırları (kuyruk dolunca 429/503) açılır.
+Profil/izleme: LIBRARY_PROFILING=1 ile açılır; `X-Profile: <LIBRARY_PROFILE_TOKEN>` başlığı
+veya örnekleme oranı ile seçilen istekler cProfile ile profillenir ve Server-Timing başlığı döner.
 """
 
 from __future__ import annotations
 
+import asyncio
+import bisect
+import cProfile
+import hashlib
 import json
+import math
+import multiprocessing
+import os
+import pstats
+import random
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Literal, Optional, Tuple
 
 import httpx
-from fastapi import FastAPI, HTTPException, status, Query, Path as FPath
-from pydantic import BaseModel, Field
+from fastapi import (
+    Depends, FastAPI, Header, HTTPException, Request, status, Query, Path as FPath
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 
+try:
+    # Proje kökünden `uvicorn Stage-3.app:app` ile paket içi import
+    from .storage import (
+        Book, _books_from_rows, _load_rows, _snapshot_path, _snapshot_rows,
+        _write_json_atomic, _write_snapshot, canonical_isbn, isbn_key,
+    )
+except ImportError:
+    from storage import (  # type: ignore[no-redef]
+        Book, _books_from_rows, _load_rows, _snapshot_path, _snapshot_rows,
+        _write_json_atomic, _write_snapshot, canonical_isbn, isbn_key,
+    )
 
-DEFAULT_UA = "GlobalAIHub-Python202-Stage3/1.0 (+contact@example.com)"
-
-
-class Book(BaseModel):
-    title: str = Field(..., min_length=1)
-    author: str = Field(..., min_length=1)
-    isbn: str = Field(..., min_length=10)
 
+DEFAULT_UA = "GlobalAIHub-Python202-Stage3/1.0 (+contact@example.com)"
 
 class BookCreate(BaseModel):
     title: str = Field(..., min_length=1)
     author: str = Field(..., min_length=1)
     isbn: str = Field(..., min_length=10)
 
+    @field_validator("isbn")
+    @classmethod
+    def normalize_isbn(cls, value: str) -> str:
+        return canonical_isbn(value)
+
 
 class BookUpdate(BaseModel):
     title: Optional[str] = Field(default=None, min_length=1)
     author: Optional[str] = Field(default=None, min_length=1)
 
 
+ChangeOp = Literal["add", "update", "remove"]
+
+
+class BookChange(BaseModel):
+    version: int
+    op: ChangeOp
+    isbn: str
+    book: Optional[Book] = None
+
+
+class ChangeFeed(BaseModel):
+    epoch: str
+    version: int
+    resync_required: bool = False
+    has_more: bool = False
+    changes: List[BookChange] = []
+
+
+SortField = Literal["title", "author", "isbn"]
+# Önek aralığının üst sınırı için en büyük kod noktası
+_MAX_CHAR = "\U0010ffff"
+
+
+def _discard(index: list, entry) -> None:
+    i = bisect.bisect_left(index, entry)
+    if i < len(index) and index[i] == entry:
+        del index[i]
+
+
+def _page(index: list, lo: int, hi: int, skip: int, limit: int, descending: bool) -> list:
+    """index[lo:hi] aralığından skip/limit ile bir sayfa keser (desc için sondan)."""
+    if descending:
+        end = hi - skip
+        return index[max(lo, end - limit):end][::-1] if end > lo else []
+    start = lo + skip
+    return index[start:min(hi, start + limit)]
+
+
+# Toplam shard boyutu bunun altındaysa süreç havuzu başlatmak yüklemeden pahalıdır
+PARALLEL_LOAD_MIN_BYTES = 1 << 20
+
+
 class Library:
-    def __init__(self, storage_path: str | Path):
+    def __init__(
+        self,
+        storage_path: str | Path,
+        *,
+        shards: int = 0,
+        load_workers: Optional[int] = None,
+        changelog_size: int = 10000,
+    ):
         self.storage_path = Path(storage_path)
-        self._books: List[Book] = []
+        # shards > 0 ise kitaplar ISBN anahtarına göre (key % shards) ayrı dosyalara bölünür
+        self.shards = shards
+        self.load_workers = load_workers or os.cpu_count() or 1
+        # Birincil indeks: isbn_key(isbn) -> Book (ekleme sırası korunur)
+        self._books: Dict[int, Book] = {}
+        # İndekse alınamayan (geçersiz/yinelenen ISBN'li) ham kayıtlar; kaydetmede aynen
+        # geri yazılır (shard'lı düzende shard 0'a)
+        self.unindexed_records: List[dict] = []
+        # Shard başına anahtarlar (sıralı küme olarak dict); değişiklik yalnızca kendi shard'ını yazar
+        self._shard_keys: List[Dict[int, None]] = [{} for _ in range(shards)]
+        # İkincil sıralı indeksler (bisect ile artımlı güncellenir):
+        # (casefold(title), key), (casefold(author), key) ve ISBN anahtarları
+        self._by_title: List[Tuple[str, int]] = []
+        self._by_author: List[Tuple[str, int]] = []
+        self._by_isbn: List[int] = []
+        self.loaded = False
+        self.load_stats: dict = {}
+        # Shard'lı düzen okunamadıysa hata; ayarlıyken hiçbir dosya yazılmaz
+        self.load_error: Optional[str] = None
+        # Sınırlı, sürümlü değişiklik günlüğü: (version, op, key, book)
+        # epoch, sürümlerin hangi yüklemeye ait olduğunu belirtir (yeniden yüklemede değişir)
+        self.version = 0
+        self.changes_epoch = secrets.token_hex(6)
+        self._changes: deque = deque(maxlen=changelog_size)
+        self.change_listeners: List[Callable[[int], None]] = []
+        # Süren upstream içe aktarmaları: anahtar -> sonuç (None veya hata) future'ı
+        self._inflight: Dict[int, asyncio.Future] = {}
+
+    @property
+    def snapshot_path(self) -> Path:
+        return _snapshot_path(self.storage_path)
+
+    @property
+    def shard_dir(self) -> Path:
+        return self.storage_path.with_name(self.storage_path.stem + ".shards")
+
+    def _shard_path(self, index: int, count: int) -> Path:
+        return self.shard_dir / f"shard-{index:03d}-of-{count:03d}.json"
+
+    def _manifest_shards(self) -> int:
+        try:
+            manifest = json.loads((self.shard_dir / "manifest.json").read_text(encoding="utf-8"))
+            return int(manifest["shards"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
 
     def load_books(self) -> None:
-        if not self.storage_path.exists():
-            self._books = []
-            return
+        """Kitapları yükler; kaynak dosyanın özeti snapshot ile eşleşirse doğrulamayı atlar.
+
+        Shard'lı düzende her shard ayrı yüklenir (yeterince büyükse süreç havuzunda).
+        Diskteki shard sayısı yapılandırmadan farklıysa kitaplar yeniden dağıtılır; shard
+        dizini yoksa mevcut tek dosya shard'lara taşınır ve `<dosya>.migrated` olarak
+        kenara alınır. Shard'lı bir düzen varken (shards=0 olsa bile) tek dosya okunmaz.
+
+        Bir shard okunamazsa yükleme başarısız sayılır: `loaded` False kalır, hata
+        `load_error`/`load_stats`'a yazılır ve yazmalar reddedilir. Aksi halde boş açılan
+        kütüphanenin ilk değişikliği sağlam bir shard'ı tek kitapla ezerdi.
+        """
+        started = time.perf_counter()
+        source = "empty"
+        stats: dict = {}
+        on_disk = self._manifest_shards()
+        if on_disk and not self.shards:
+            # Eski tek dosya taşınmadan önceki halidir; güncel veri shard'lardadır
+            self.shards = on_disk
+        failed = False
+        unindexed: List[dict] = []
         try:
-            raw = json.loads(self.storage_path.read_text(encoding="utf-8"))
-            if not isinstance(raw, list):
-                self._books = []
+            if on_disk:
+                books, source, stats = self._load_shards(on_disk, unindexed)
+            elif self.storage_path.exists():
+                rows, unindexed, source = _load_rows(self.storage_path)
+                books = _books_from_rows([rows], unindexed)
+            else:
+                books = {}
+        except Exception as e:
+            if on_disk:
+                self._books = {}
+                self.unindexed_records = []
+                self._rebuild_indexes()
+                self.load_error = f"Shard'lar okunamadı: {type(e).__name__}: {e}"
+                self.load_stats = {"source": "failed", "error": self.load_error, "shards": on_disk}
+                self.loaded = False
                 return
-            self._books = [Book(**item) for item in raw]
-        except Exception:
-            self._books = []
+            books = {}
+            unindexed = []
+            failed = True
+        self.load_error = None
+        self._books = books
+        self.unindexed_records = unindexed
+        self._rebuild_indexes()
+        # Veri kümesi bütünüyle değişti: eski sürümlerle delta senkronu yapılamaz
+        self._changes.clear()
+        self.changes_epoch = secrets.token_hex(6)
+        if self.shards:
+            self._rebuild_shard_keys()
+            # Okunamayan bir düzen boş kitap listesiyle üzerine yazılmasın
+            if not failed and on_disk != self.shards and (books or unindexed or on_disk):
+                self.save_books()
+                if not on_disk and self.storage_path.exists():
+                    os.replace(
+                        self.storage_path,
+                        self.storage_path.with_name(self.storage_path.name + ".migrated"),
+                    )
+                    self.snapshot_path.unlink(missing_ok=True)
+        self.load_stats = {
+            "source": source,
+            "books": len(self._books),
+            "unindexed": len(self.unindexed_records),
+            "seconds": round(time.perf_counter() - started, 6),
+            **stats,
+        }
+        self.loaded = True
+
+    def _load_shards(
+        self, count: int, unindexed: List[dict]
+    ) -> Tuple[Dict[int, Book], str, dict]:
+        shard_ids = [i for i in range(count) if self._shard_path(i, count).exists()]
+        paths = [self._shard_path(i, count) for i in shard_ids]
+        total_bytes = sum(p.stat().st_size for p in paths)
+        workers = min(self.load_workers, len(paths))
+        parallel = workers > 1 and total_bytes >= PARALLEL_LOAD_MIN_BYTES
+        if parallel:
+            # fork, event loop/thread'leri olan bir süreçte güvenli değil; işçiler yalnızca
+            # yan etkisiz storage modülünü import eder
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                results = list(pool.map(_load_rows, paths))
+        else:
+            results = [_load_rows(p) for p in paths]
+        source = "json" if any(src == "json" for _, _, src in results) else "snapshot"
+        for _, skipped, _ in results:
+            unindexed.extend(skipped)
+        # Önce anahtarı kendi shard'ında olan satırlar: shard 0'a geri yazılan yinelenen
+        # kayıtlar asıl kayıtların yerini almasın
+        home = [
+            [row for row in rows if int(row[2]) % count == i]
+            for i, (rows, _, _) in zip(shard_ids, results)
+        ]
+        stray = [
+            [row for row in rows if int(row[2]) % count != i]
+            for i, (rows, _, _) in zip(shard_ids, results)
+        ]
+        books = _books_from_rows(home + stray, unindexed)
+        return books, source, {"shards": count, "parallel": parallel}
+
+    def _rebuild_shard_keys(self) -> None:
+        self._shard_keys = [{} for _ in range(self.shards)]
+        for key in self._books:
+            self._shard_keys[key % self.shards][key] = None
+
+    def _write_books(self, path: Path, books: List[Book], unindexed: List[dict]) -> None:
+        """Kitapları yazar ve snapshot'ı yazılan baytların özetiyle tazeler.
+
+        Böylece bir sonraki açılış (ör. kademeli yeniden başlatma) doğrulamayı atlar.
+        """
+        payload = _write_json_atomic(path, [b.model_dump() for b in books] + unindexed)
+        rows, skipped = _snapshot_rows(books, unindexed)
+        _write_snapshot(path, hashlib.sha256(payload).hexdigest(), rows, skipped)
+
+    def _write_shard(self, index: int) -> None:
+        books = [self._books[k] for k in self._shard_keys[index]]
+        unindexed = self.unindexed_records if index == 0 else []
+        self._write_books(self._shard_path(index, self.shards), books, unindexed)
 
     def save_books(self) -> None:
-        data = [b.model_dump() for b in self._books]
-        self.storage_path.write_text(
-            json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
+        self._ensure_writable()
+        with trace_span("storage"):
+            if self.shards:
+                self._save_all_shards()
+                return
+            self._write_books(
+                self.storage_path, list(self._books.values()), self.unindexed_records
+            )
+
+    def _save_all_shards(self) -> None:
+        # Önce yeni shard'lar, sonra manifest (atomik), en son eski düzenin dosyaları:
+        # yarıda kesilen bir yeniden dağıtım eski düzeni okunabilir bırakır.
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        for index in range(self.shards):
+            self._write_shard(index)
+        _write_json_atomic(self.shard_dir / "manifest.json", {"version": 1, "shards": self.shards})
+        current = f"-of-{self.shards:03d}.json"
+        for stale in self.shard_dir.glob("shard-*"):
+            if current not in stale.name:
+                stale.unlink(missing_ok=True)
+
+    def _ensure_writable(self) -> None:
+        if self.load_error is not None:
+            raise RuntimeError(f"Kütüphane yazmaya kapalı ({self.load_error})")
+
+    def _persist(self, key: int) -> None:
+        """Değişikliği yazar: shard'lı düzende yalnızca anahtarın shard'ı yeniden yazılır."""
+        if not self.shards:
+            self.save_books()
+            return
+        with trace_span("storage"):
+            if not self.shard_dir.exists():
+                self._save_all_shards()
+            else:
+                self._write_shard(key % self.shards)
+
+    # Değişiklik günlüğü
+    def _record_change(self, op: ChangeOp, key: int, book: Optional[Book]) -> None:
+        self.version += 1
+        self._changes.append((self.version, op, key, book))
+        for listener in self.change_listeners:
+            listener(self.version)
+
+    def changes_since(self, version: int, limit: int = 500) -> Optional[List[BookChange]]:
+        """`version` sonrasındaki en fazla `limit` değişikliği döndürür.
+
+        İstenen sürüm günlükten düşmüşse (veya ileride ise) None döner: istemci tam
+        senkron yapmalıdır.
+        """
+        floor = self._changes[0][0] - 1 if self._changes else self.version
+        if version < floor or version > self.version:
+            return None
+        # Sürümler ardışık olduğundan başlangıç konumu doğrudan hesaplanır
+        start = version - floor
+        return [
+            BookChange(version=v, op=op, isbn=str(key), book=book)
+            for v, op, key, book in islice(self._changes, start, start + limit)
+        ]
+
+    def rebalance(self, shards: int) -> None:
+        """Kitapları yeni shard sayısına göre yeniden dağıtır ve tüm shard'ları yazar."""
+        if shards < 1:
+            raise ValueError("Shard sayısı en az 1 olmalı")
+        self._ensure_writable()
+        self.shards = shards
+        self._rebuild_shard_keys()
+        self.save_books()
+
+    # İkincil indeks bakımı
+    def _rebuild_indexes(self) -> None:
+        self._by_title = sorted((b.title.casefold(), k) for k, b in self._books.items())
+        self._by_author = sorted((b.author.casefold(), k) for k, b in self._books.items())
+        self._by_isbn = sorted(self._books)
+
+    def _index_add(self, key: int, book: Book) -> None:
+        bisect.insort(self._by_title, (book.title.casefold(), key))
+        bisect.insort(self._by_author, (book.author.casefold(), key))
+        bisect.insort(self._by_isbn, key)
+
+    def _index_remove(self, key: int, book: Book) -> None:
+        _discard(self._by_title, (book.title.casefold(), key))
+        _discard(self._by_author, (book.author.casefold(), key))
+        _discard(self._by_isbn, key)
 
     def list_books(self) -> List[Book]:
-        return list(self._books)
+        return list(self._books.values())
+
+    def query_books(
+        self,
+        *,
+        sort: Optional[SortField] = None,
+        descending: bool = False,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 50,
+    ) -> List[Book]:
+        """Filtrelenmiş ve sıralanmış bir sayfa döndürür.
+
+        Filtre yoksa ve sort verilmemişse ekleme sırası kullanılır. Filtre verilip sort
+        verilmezse filtrenin alanına göre sıralanır. author (büyük/küçük harf duyarsız tam
+        eşleşme) veya title_prefix tek başına ve kendi alanıyla sıralanıyorsa sayfa, indeks
+        aralığından doğrudan kesilir: O(log n + skip + limit). Diğer kombinasyonlarda
+        eşleşen aralık bellekte sıralanır.
+        """
+        if author is None and title_prefix is None:
+            if sort is None:
+                values = self._books.values()
+                ordered = reversed(values) if descending else iter(values)
+                return list(islice(ordered, skip, skip + limit))
+            if sort == "isbn":
+                keys = _page(self._by_isbn, 0, len(self._by_isbn), skip, limit, descending)
+                return [self._books[k] for k in keys]
+            index = self._by_title if sort == "title" else self._by_author
+            entries = _page(index, 0, len(index), skip, limit, descending)
+            return [self._books[k] for _, k in entries]
+
+        # (değer,) demeti aynı değerli tüm (değer, key) girdilerinden küçüktür
+        if author is not None:
+            field, index = "author", self._by_author
+            low = author.casefold()
+            high = low + "\0"
+        else:
+            field, index = "title", self._by_title
+            low = title_prefix.casefold()
+            high = low + _MAX_CHAR
+        lo = bisect.bisect_left(index, (low,))
+        hi = bisect.bisect_left(index, (high,))
+        sort = sort or field
+
+        if sort == field and (author is None or title_prefix is None):
+            return [self._books[k] for _, k in _page(index, lo, hi, skip, limit, descending)]
+
+        books = [self._books[k] for _, k in index[lo:hi]]
+        if author is not None and title_prefix is not None:
+            prefix = title_prefix.casefold()
+            books = [b for b in books if b.title.casefold().startswith(prefix)]
+        if sort == "isbn":
+            books.sort(key=lambda b: int(b.isbn), reverse=descending)
+        else:
+            books.sort(key=lambda b: (getattr(b, sort).casefold(), int(b.isbn)), reverse=descending)
+        return books[skip:skip + limit]
 
     def find_book(self, isbn: str) -> Optional[Book]:
-        for b in self._books:
-            if b.isbn == isbn:
-                return b
-        return None
+        try:
+            return self._books.get(isbn_key(isbn))
+        except ValueError:
+            return None
 
     def add_book(self, book: Book) -> None:
-        if self.find_book(book.isbn) is not None:
+        self._ensure_writable()
+        key = isbn_key(book.isbn)
+        if key in self._books:
             raise ValueError("ISBN zaten mevcut")
-        self._books.append(book)
-        self.save_books()
+        self._books[key] = book
+        self._index_add(key, book)
+        if self.shards:
+            self._shard_keys[key % self.shards][key] = None
+        self._persist(key)
+        self._record_change("add", key, book)
 
     def remove_book(self, isbn: str) -> None:
-        before = len(self._books)
-        self._books = [b for b in self._books if b.isbn != isbn]
-        if len(self._books) == before:
+        self._ensure_writable()
+        key = isbn_key(isbn)
+        book = self._books.pop(key, None)
+        if book is None:
             raise ValueError("Kitap bulunamadı")
-        self.save_books()
+        self._index_remove(key, book)
+        if self.shards:
+            self._shard_keys[key % self.shards].pop(key, None)
+        self._persist(key)
+        self._record_change("remove", key, None)
 
     def update_book(self, isbn: str, update: BookUpdate) -> Book:
-        book = self.find_book(isbn)
+        self._ensure_writable()
+        key = isbn_key(isbn)
+        book = self._books.get(key)
         if book is None:
             raise ValueError("Kitap bulunamadı")
         new_book = book.model_copy(update={
             "title": update.title if update.title is not None else book.title,
             "author": update.author if update.author is not None else book.author,
         })
-        # replace
-        self._books = [new_book if b.isbn == isbn else b for b in self._books]
-        self.save_books()
+        # replace (dict ataması ekleme sırasını korur)
+        self._books[key] = new_book
+        self._index_remove(key, book)
+        self._index_add(key, new_book)
+        self._persist(key)
+        self._record_change("update", key, new_book)
         return new_book
 
-    def add_book_by_isbn(self, isbn: str, *, user_agent: str = DEFAULT_UA) -> Book:
-        if self.find_book(isbn) is not None:
+    def _new_isbn(self, isbn: str) -> str:
+        # Eşdeğer ISBN'ler (ISBN-10/13, tireli) aynı anahtara düşer; upstream'e tekrar gidilmez
+        key = isbn_key(isbn)
+        if key in self._books:
             raise ValueError("ISBN zaten mevcut")
-        title, authors = fetch_book_metadata(isbn, user_agent=user_agent)
+        return str(key)
+
+    def _add_fetched(self, isbn: str, title: str, authors: List[str]) -> Book:
         author_str = ", ".join(authors) if authors else "Unknown"
         book = Book(title=title, author=author_str, isbn=isbn)
-        self._books.append(book)
-        self.save_books()
+        self.add_book(book)
         return book
 
+    def add_book_by_isbn(self, isbn: str, *, user_agent: str = DEFAULT_UA) -> Book:
+        isbn = self._new_isbn(isbn)
+        title, authors = fetch_book_metadata(isbn, user_agent=user_agent)
+        return self._add_fetched(isbn, title, authors)
 
-def fetch_book_metadata(isbn: str, *, user_agent: str = DEFAULT_UA) -> Tuple[str, List[str]]:
-    base = "https://openlibrary.org"
-    url = f"{base}/isbn/{isbn}.json"
-    headers = {"User-Agent": user_agent, "Accept": "application/json"}
+    async def add_book_by_isbn_async(self, isbn: str, *, user_agent: str = DEFAULT_UA) -> Book:
+        """add_book_by_isbn'in event loop'u bloklamayan hali.
+
+        Upstream çağrıları thread havuzunda yapılır; kütüphane yalnızca çağıran
+        (event loop) thread'inde değiştirilir. Aynı anahtar için eşzamanlı çağrılar tek bir
+        upstream isteğinde birleştirilir (single-flight): bekleyenler, ilk çağrı başarılıysa
+        "zaten mevcut" hatasını, başarısızsa aynı hatayı alır.
+        """
+        key = isbn_key(isbn)
+        while key in self._inflight:
+            # shield: bekleyen istek iptal edilirse ortak future iptal olmasın
+            failure = await asyncio.shield(self._inflight[key])
+            if failure is not None:
+                raise failure
+        isbn = self._new_isbn(isbn)
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[key] = done
+        error: Optional[Exception] = None
+        try:
+            title, authors = await asyncio.to_thread(
+                run_profiled, fetch_book_metadata, isbn, user_agent=user_agent
+            )
+            return self._add_fetched(isbn, title, authors)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # İptal edilirse (error None) bekleyenlerden biri yeni çağrıyı üstlenir
+            del self._inflight[key]
+            done.set_result(error)
+
+
+# --- İstek bazlı izleme (tracing) --------------------------------------------
+# Yalnızca ProfilingMiddleware bir isteği seçtiğinde span listesi kurulur; aksi halde
+# trace_span() tek bir ContextVar okuması yapıp paylaşılan nullcontext'i döndürür.
+
+_current_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "library_trace", default=None
+)
+# İstek profilleniyorsa worker thread'lerinde toplanan ek profiller (istek profiline eklenir)
+_current_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar(
+    "library_profiles", default=None
+)
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("name", "spans", "started")
+
+    def __init__(self, name: str, spans: List[Tuple[str, float]]):
+        self.name = name
+        self.spans = spans
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.spans.append((self.name, (time.perf_counter() - self.started) * 1000))
+
+
+def trace_span(name: str):
+    """Aktif bir istek izi varsa süresini ölçen bir span döndürür (yoksa no-op)."""
+    spans = _current_trace.get()
+    if spans is None:
+        return _NO_SPAN
+    return _Span(name, spans)
+
+
+def run_profiled(fn: Callable, *args, **kwargs):
+    """fn'i çağırır; istek profilleniyorsa bu thread'de ayrı bir cProfile ile ölçer.
+
+    cProfile yalnızca etkinleştirildiği thread'i izler. asyncio.to_thread ile worker'a
+    taşınan işler bununla sarılırsa istek profiline eklenir (bağlam to_thread ile taşınır).
+    """
+    collected = _current_profiles.get()
+    if collected is None:
+        return fn(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+: profiler süreç genelidir ve zaten aktif; bu thread de ölçülüyor
+        return fn(*args, **kwargs)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        collected.append(profiler)
+
+
+# --- Upstream dayanıklılık katmanı -------------------------------------------
+# Open Library yavaşladığında her çağrı tam `timeout` kadar beklemesin diye:
+# - idempotent GET'ler jitter'lı üstel geri çekilme ile yeniden denenir (Retry-After'a uyulur),
+# - ardışık hatalardan sonra devre kesici (circuit breaker) hızlıca hata döner,
+# - her istek için toplam bir süre bütçesi (deadline) vardır.
+
+UPSTREAM_TIMEOUT = 10.0
+UPSTREAM_DEADLINE = 15.0
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class UpstreamUnavailable(ValueError):
+    """Open Library'ye şu an gidilmiyor (devre açık veya süre bütçesi tükendi)."""
+
+    def __init__(self, message: str, *, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """İstek başına toplam süre bütçesi (monotonic saat ile)."""
+
+    def __init__(self, budget: float, *, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+
+class RetryPolicy:
+    """Yeniden deneme ayarları. Geri çekilme "full jitter": rastgele [0, min(cap, base * 2^n)]."""
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_cap: float = 2.0,
+        timeout: float = UPSTREAM_TIMEOUT,
+        *,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.sleep = sleep
+        self.rng = rng
+
+    def backoff(self, attempt: int) -> float:
+        return self.rng() * min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+
+
+class CircuitBreaker:
+    """Ardışık hatalardan sonra upstream çağrılarını kısa devre eder.
+
+    closed → (failure_threshold ardışık hata) → open → (reset_timeout) → half-open.
+    half-open durumunda tek bir deneme çağrısına izin verilir; başarılıysa closed'a,
+    değilse tekrar open'a geçilir.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def retry_after(self) -> float:
+        """Devrenin tekrar deneme kabul etmesine kalan süre (saniye)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def reset(self) -> None:
+        self.record_success()
+
+
+upstream_breaker = CircuitBreaker()
+upstream_retry = RetryPolicy()
+
+
+def _retry_after_seconds(resp) -> Optional[float]:
+    headers = getattr(resp, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
     try:
-        resp = httpx.get(url, timeout=10, headers=headers)
-    except httpx.RequestError as e:
-        raise ValueError("Ağ hatası: Open Library API'ye ulaşılamıyor.") from e
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
 
+
+def upstream_get(
+    url: str,
+    *,
+    headers: dict,
+    deadline: Deadline,
+    breaker: Optional[CircuitBreaker] = None,
+    policy: Optional[RetryPolicy] = None,
+):
+    """Tek bir GET'i devre kesici, yeniden deneme ve süre bütçesi altında yapar.
+
+    Denemeler yeniden denenebilir bir durum koduyla veya ağ hatasıyla biterse, devre
+    açıksa ya da bütçe bittiyse UpstreamUnavailable yükseltir (varsa son yanıtın
+    Retry-After değeriyle).
+    """
+    breaker = breaker or upstream_breaker
+    policy = policy or upstream_retry
+    attempt = 0
+    while True:
+        # Bütçe allow()'dan önce denetlenir: half-open'da allow() deneme hakkını ayırır ve
+        # sonuç kaydedilmeden çıkılırsa devre kilitli kalır
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise UpstreamUnavailable("Open Library için süre bütçesi tükendi.")
+        if not breaker.allow():
+            raise UpstreamUnavailable(
+                "Open Library geçici olarak devre dışı (circuit open).",
+                retry_after=breaker.retry_after(),
+            )
+
+        resp = None
+        error: Optional[httpx.RequestError] = None
+        try:
+            with trace_span("openlibrary"):
+                resp = httpx.get(url, timeout=min(policy.timeout, remaining), headers=headers)
+        except httpx.RequestError as e:
+            error = e
+        except httpx.InvalidURL as e:
+            # Yönlendirme bozuk bir adrese işaret ediyor
+            breaker.record_failure()
+            raise UpstreamUnavailable("Open Library geçersiz bir adrese yönlendirdi.") from e
+        except BaseException:
+            # Beklenmeyen hatada da sonuç kaydedilir; yoksa half-open deneme bayrağı açık kalır
+            breaker.record_failure()
+            raise
+        if resp is not None and resp.status_code not in RETRYABLE_STATUS:
+            breaker.record_success()
+            return resp
+        breaker.record_failure()
+
+        if attempt >= policy.max_retries:
+            break
+        delay = policy.backoff(attempt)
+        retry_after = _retry_after_seconds(resp) if resp is not None else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if delay >= deadline.remaining():
+            break
+        policy.sleep(delay)
+        attempt += 1
+
+    if resp is not None:
+        raise UpstreamUnavailable(
+            f"Open Library geçici olarak yanıt vermiyor ({resp.status_code}).",
+            retry_after=_retry_after_seconds(resp),
+        )
+    raise UpstreamUnavailable("Ağ hatası: Open Library API'ye ulaşılamıyor.") from error
+
+
+def _get_following_redirect(url: str, **kwargs):
+    resp = upstream_get(url, **kwargs)
     if 300 <= resp.status_code < 400:
         location = resp.headers.get("location") or resp.headers.get("Location")
         if location:
-            try:
-                resp = httpx.get(location, timeout=10, headers=headers)
-            except httpx.RequestError as e:
-                raise ValueError("Ağ hatası: Open Library yönlendirme başarısız.") from e
+            resp = upstream_get(location, **kwargs)
+    return resp
+
+
+def fetch_book_metadata(
+    isbn: str,
+    *,
+    user_agent: str = DEFAULT_UA,
+    deadline: Optional[Deadline] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    policy: Optional[RetryPolicy] = None,
+) -> Tuple[str, List[str]]:
+    base = "https://openlibrary.org"
+    url = f"{base}/isbn/{isbn}.json"
+    headers = {"User-Agent": user_agent, "Accept": "application/json"}
+    upstream = {
+        "headers": headers,
+        "deadline": deadline or Deadline(UPSTREAM_DEADLINE),
+        "breaker": breaker,
+        "policy": policy,
+    }
+    resp = _get_following_redirect(url, **upstream)
 
     if resp.status_code == 404:
         raise ValueError("Kitap bulunamadı (404).")
@@ -145,29 +865,29 @@ def fetch_book_metadata(isbn: str, *, user_agent: str = DEFAULT_UA) -> Tuple[str
         raise ValueError("API yanıtı geçersiz: 'title' alanı yok.")
 
     authors: List[str] = []
+    degraded = False
     author_refs = data.get("authors") or []
     for ref in author_refs:
         key = ref.get("key")
         if not key:
             continue
         try:
-            a_resp = httpx.get(f"{base}{key}.json", timeout=10, headers=headers)
-            if 300 <= a_resp.status_code < 400:
-                loc = a_resp.headers.get("location") or a_resp.headers.get("Location")
-                if loc:
-                    a_resp = httpx.get(loc, timeout=10, headers=headers)
-            if a_resp.status_code == 200:
-                try:
-                    a_data = a_resp.json()
-                except Exception:
-                    a_data = {}
-                name = a_data.get("name")
-                if name:
-                    authors.append(name)
-        except httpx.RequestError:
-            continue
+            a_resp = _get_following_redirect(f"{base}{key}.json", **upstream)
+        except UpstreamUnavailable:
+            # Bütçe bitti, devre açıldı veya upstream yanıt vermiyor: kalan yazarları
+            # beklemeden by_statement'a düş
+            degraded = True
+            break
+        if a_resp.status_code == 200:
+            try:
+                a_data = a_resp.json()
+            except Exception:
+                a_data = {}
+            name = a_data.get("name")
+            if name:
+                authors.append(name)
 
-    if not authors:
+    if not authors or degraded:
         by_stmt = data.get("by_statement")
         if by_stmt:
             authors = [by_stmt]
@@ -175,11 +895,418 @@ def fetch_book_metadata(isbn: str, *, user_agent: str = DEFAULT_UA) -> Tuple[str
     return title, authors
 
 
-app = FastAPI(title="Stage-3 Library API", version="1.0.0")
+storage_file = Path(os.getenv("LIBRARY_STORAGE") or Path(__file__).with_name("library.json"))
+lib = Library(
+    storage_file,
+    shards=int(os.getenv("LIBRARY_SHARDS", "0")),
+    load_workers=int(os.getenv("LIBRARY_LOAD_WORKERS", "0")) or None,
+    changelog_size=int(os.getenv("LIBRARY_CHANGELOG_SIZE", "10000")),
+)
+LAZY_LOAD = os.getenv("LIBRARY_LAZY_LOAD", "0") == "1"
+if not LAZY_LOAD:
+    lib.load_books()
+
+
+def _resolve(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class ChangeNotifier:
+    """Değişiklik bekleyen long-poll/SSE isteklerini uyandırır.
+
+    Library.change_listeners'a eklenir; notify() herhangi bir thread'den çağrılabilir.
+    Yalnızca kayıtlı bekleyenler uyandırılır: başka bir thread'deki değişiklik sürüm
+    kontrolü ile wait() kaydı arasına düşerse bekleme süre dolana kadar sürer. Bu yüzden
+    çağıranlar wait()'in sonucundan bağımsız olarak akışı her seferinde yeniden okur.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: set = set()
+
+    def notify(self, version: int) -> None:
+        with self._lock:
+            waiters, self._waiters = self._waiters, set()
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_resolve, fut)
+
+    async def wait(self, timeout: float) -> bool:
+        """Bir değişiklik olursa True, süre dolarsa False döner."""
+        loop = asyncio.get_running_loop()
+        entry = (loop, loop.create_future())
+        with self._lock:
+            self._waiters.add(entry)
+        try:
+            await asyncio.wait_for(entry[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+
+change_notifier = ChangeNotifier()
+lib.change_listeners.append(change_notifier.notify)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loader = None
+    if not lib.loaded:
+        # Sunucu bağlantı kabul etmeye başlarken yükleme arka planda sürer; /ready bunu raporlar
+        loader = asyncio.create_task(asyncio.to_thread(lib.load_books))
+    yield
+    if loader is not None:
+        await loader
+
+
+app = FastAPI(title="Stage-3 Library API", version="1.0.0", lifespan=lifespan)
+
+
+# cProfile aynı anda yalnızca bir profil oturumunu destekler
+_profile_lock = threading.Lock()
+
+
+class ProfilingMiddleware:
+    """Seçilen istekleri cProfile ile profiller ve Server-Timing başlığı ekler.
+
+    Bir istek, `header` başlığı yapılandırılmış `token` ile gönderildiğinde veya
+    `sample_rate` olasılığıyla seçilir (token yoksa başlık yok sayılır; böylece anonim
+    istemciler profillemeyi tetikleyemez). Seçilmeyen istekler doğrudan uygulamaya geçer.
+    Profil, istek süresince aynı event loop'ta çalışan diğer coroutine'leri de içerebilir;
+    başka bir profil sürerken gelen istekler yalnızca izlenir (span'lar), profillenmez.
+    Dizinde en fazla `max_files` profil tutulur; en eskiler silinir.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        profile_dir: str | Path,
+        sample_rate: float = 0.0,
+        header: str = "x-profile",
+        token: Optional[str] = None,
+        max_files: int = 100,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.app = app
+        self.profile_dir = Path(profile_dir)
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self.token = token.encode("latin-1") if token else None
+        self.max_files = max_files
+        self.rng = rng
+        # Aynı milisaniyedeki profiller birbirinin üzerine yazılmasın (yalnızca event loop artırır)
+        self._sequence = 0
+
+    def _selected(self, scope) -> bool:
+        if self.token is not None:
+            for name, value in scope.get("headers") or ():
+                if name == self.header and secrets.compare_digest(value, self.token):
+                    return True
+        return self.sample_rate > 0 and self.rng() < self.sample_rate
+
+    def _dump(
+        self, profiler: cProfile.Profile, workers: List[cProfile.Profile], scope
+    ) -> Path:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        self._sequence += 1
+        name = f"{int(time.time() * 1000)}-{self._sequence:06d}-{scope['method']}-{slug}"
+        out = self.profile_dir / f"{name}.prof"
+        stats = pstats.Stats(profiler)
+        for extra in workers:
+            stats.add(extra)
+        stats.dump_stats(out)
+        # Dosya adları zaman damgasıyla başladığından ada göre sıralama yaşa göre sıralamadır
+        for stale in sorted(self.profile_dir.glob("*.prof"))[:-self.max_files]:
+            stale.unlink(missing_ok=True)
+        return out
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _current_trace.set(spans)
+        profiler = cProfile.Profile() if _profile_lock.acquire(blocking=False) else None
+        workers: List[cProfile.Profile] = []
+        profiles_token = _current_profiles.set(workers if profiler is not None else None)
+        started = time.perf_counter()
+
+        def stop_profiler() -> Optional[Path]:
+            nonlocal profiler
+            if profiler is None:
+                return None
+            profiler.disable()
+            _profile_lock.release()
+            out = self._dump(profiler, workers, scope)
+            profiler = None
+            return out
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = (time.perf_counter() - started) * 1000
+                profile_file = stop_profiler()
+                metrics = [f"{name};dur={dur:.2f}" for name, dur in spans]
+                metrics.append(f"total;dur={total:.2f}")
+                headers = list(message.get("headers") or [])
+                headers.append((b"server-timing", ", ".join(metrics).encode("latin-1")))
+                if profile_file is not None:
+                    headers.append((b"x-profile-file", profile_file.name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            if profiler is not None:
+                profiler.enable()
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler = None
+                _profile_lock.release()
+            _current_profiles.reset(profiles_token)
+            _current_trace.reset(token)
+
+
+PROFILING_ENABLED = os.getenv("LIBRARY_PROFILING", "0") == "1"
+if PROFILING_ENABLED:
+    # Kapalıyken middleware hiç eklenmez: istek yolunda ek maliyet yoktur
+    app.add_middleware(
+        ProfilingMiddleware,
+        profile_dir=os.getenv("LIBRARY_PROFILE_DIR") or Path(__file__).with_name("profiles"),
+        sample_rate=float(os.getenv("LIBRARY_PROFILE_SAMPLE_RATE", "0")),
+        token=os.getenv("LIBRARY_PROFILE_TOKEN") or None,
+        max_files=int(os.getenv("LIBRARY_PROFILE_MAX_FILES", "100")),
+    )
+
+
+# --- Kabul kontrolü (admission control) ----------------------------------------
+# Upstream'e giden pahalı route'lar ucuz okumaları aç bırakmasın diye: istemci başına
+# token bucket, route sınıfı başına eşzamanlılık sınırı ve sınırlı bekleme kuyruğu.
+
+
+class TokenBucket:
+    """`rate` token/sn dolan, en fazla `capacity` token tutan kova."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
 
-storage_file = Path(__file__).with_name("library.json")
-lib = Library(storage_file)
-lib.load_books()
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """Token alınabildiyse 0, aksi halde yeterli token birikene kadar kalan süreyi döndürür."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+
+class ConcurrencyLimiter:
+    """En fazla `limit` eşzamanlı istek; fazlası en çok `max_queue` derinlikte FIFO bekler.
+
+    Tek bir event loop içinde kullanılır. Kuyruk doluysa veya `queue_timeout` aşılırsa
+    acquire() False döner (istek reddedilir).
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            # release() slotu doğrudan bekleyene devreder (active azalmaz)
+            await asyncio.wait_for(fut, self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            # Süre dolarken slot devredilmiş olabilir
+            return fut.done() and not fut.cancelled()
+        except asyncio.CancelledError:
+            # İstemci giderken slot devredildiyse sıradakine aktar
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            if fut in self._waiters:
+                self._waiters.remove(fut)
+
+    def release(self) -> None:
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+
+def admission_class(method: str, path: str) -> Optional[str]:
+    """İsteğin eşzamanlılık havuzunu döndürür.
+
+    None: kabul kontrolü dışı (/, /ready, /docs); "": yalnızca hız sınırı (uzun süre açık
+    kalan /books/changes uçları slot tutmasın); aksi halde "upstream" veya "local".
+    """
+    if path != "/books" and not path.startswith("/books/"):
+        return None
+    if path.startswith("/books/changes"):
+        return ""
+    if method == "POST" and path.startswith("/books/isbn/"):
+        return "upstream"
+    return "local"
+
+
+class AdmissionControlMiddleware:
+    """İstemci başına hız sınırı (429) ve havuz başına eşzamanlılık/kuyruk sınırı (503).
+
+    İstemci anahtarı, `api_keys` listesindeki bir `X-API-Key` başlığı, yoksa bağlantının
+    IP adresidir: bilinmeyen anahtarlar yok sayılır, böylece her istekte yeni bir anahtar
+    uydurarak kova değiştirilemez. Bellek sınırlı kalsın diye en fazla `max_clients` kova
+    LRU olarak tutulur.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        rate: float = 20.0,
+        burst: float = 40.0,
+        limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        queue_timeout: float = 5.0,
+        max_clients: int = 10000,
+        api_keys: Iterable[str] = (),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.app = app
+        self.api_keys = frozenset(api_keys)
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        limits = limits or {"upstream": (4, 16), "local": (64, 256)}
+        self.pools = {
+            name: ConcurrencyLimiter(limit, max_queue, queue_timeout)
+            for name, (limit, max_queue) in limits.items()
+        }
+
+    def _client_key(self, scope) -> str:
+        for name, value in scope.get("headers") or ():
+            if name == b"x-api-key" and value:
+                key = value.decode("latin-1")
+                if key in self.api_keys:
+                    return "key:" + key
+                break
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    def _bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    @staticmethod
+    async def _reject(scope, receive, send, status_code: int, detail: str, retry_after: float):
+        headers = {"Retry-After": str(max(1, math.ceil(min(retry_after, 3600))))}
+        response = JSONResponse(
+            status_code=status_code, content={"detail": detail}, headers=headers
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        pool_name = admission_class(scope["method"], scope["path"])
+        if pool_name is None:
+            await self.app(scope, receive, send)
+            return
+
+        now = self.clock()
+        wait = self._bucket(self._client_key(scope), now).take(now)
+        if wait > 0:
+            await self._reject(scope, receive, send, 429, "İstek sınırı aşıldı", wait)
+            return
+
+        pool = self.pools.get(pool_name)
+        if pool is None:
+            await self.app(scope, receive, send)
+            return
+        if not await pool.acquire():
+            await self._reject(scope, receive, send, 503, "Sunucu yoğun, daha sonra deneyin", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release()
+
+
+ADMISSION_ENABLED = os.getenv("LIBRARY_ADMISSION", "0") == "1"
+if ADMISSION_ENABLED:
+    # En son eklenen middleware en dıştadır: reddedilen istekler profillenmez
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        rate=float(os.getenv("LIBRARY_RATE_LIMIT", "20")),
+        burst=float(os.getenv("LIBRARY_RATE_BURST", "40")),
+        limits={
+            "upstream": (
+                int(os.getenv("LIBRARY_UPSTREAM_CONCURRENCY", "4")),
+                int(os.getenv("LIBRARY_UPSTREAM_QUEUE", "16")),
+            ),
+            "local": (
+                int(os.getenv("LIBRARY_LOCAL_CONCURRENCY", "64")),
+                int(os.getenv("LIBRARY_LOCAL_QUEUE", "256")),
+            ),
+        },
+        queue_timeout=float(os.getenv("LIBRARY_QUEUE_TIMEOUT", "5")),
+        api_keys=[k.strip() for k in os.getenv("LIBRARY_API_KEYS", "").split(",") if k.strip()],
+    )
+
+
+def require_ready() -> None:
+    """Kitaplar yüklenmediyse 503 döner (lazy load sırasında veya yükleme başarısızsa)."""
+    if not lib.loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=lib.load_error or "Kütüphane yükleniyor",
+            headers={"Retry-After": "1"},
+        )
+
+
+def isbn_path(isbn: str = FPath(..., min_length=10)) -> str:
+    """Yol parametresindeki ISBN'i kanonikleştirir; geçersizse 400 döner."""
+    try:
+        return canonical_isbn(isbn)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @app.get("/")
@@ -187,21 +1314,127 @@ async def root():
     return {"message": "Stage-3 Library API"}
 
 
-@app.get("/books", response_model=list[Book])
-async def list_books(skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200)):
-    books = lib.list_books()
-    return books[skip: skip + limit]
+@app.get("/ready")
+async def ready():
+    if not lib.loaded:
+        content = {"status": "loading"}
+        if lib.load_error is not None:
+            content = {"status": "failed", **lib.load_stats}
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content)
+    return {"status": "ready", **lib.load_stats}
+
+
+@app.get("/books", response_model=list[Book], dependencies=[Depends(require_ready)])
+async def list_books(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    sort: Optional[SortField] = Query(None),
+    order: Literal["asc", "desc"] = Query("asc"),
+    author: Optional[str] = Query(None, min_length=1),
+    title_prefix: Optional[str] = Query(None, min_length=1),
+):
+    return lib.query_books(
+        sort=sort,
+        descending=order == "desc",
+        author=author,
+        title_prefix=title_prefix,
+        skip=skip,
+        limit=limit,
+    )
 
 
-@app.get("/books/{isbn}", response_model=Book)
-async def get_book(isbn: str = FPath(..., min_length=10)):
+def _change_feed(since: int, epoch: Optional[str], limit: int) -> ChangeFeed:
+    current = lib.changes_epoch
+    changes = lib.changes_since(since, limit + 1) if epoch in (None, current) else None
+    if changes is None:
+        return ChangeFeed(epoch=current, version=lib.version, resync_required=True)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    version = changes[-1].version if changes else since
+    return ChangeFeed(epoch=current, version=version, has_more=has_more, changes=changes)
+
+
+# /books/{isbn}'den önce tanımlanmalı; aksi halde "changes" ISBN olarak eşleşir
+@app.get("/books/changes", response_model=ChangeFeed, dependencies=[Depends(require_ready)])
+async def list_changes(
+    since: int = Query(..., ge=0),
+    epoch: Optional[str] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+    wait: float = Query(0, ge=0, le=60),
+):
+    """`since` sürümünden sonraki değişiklikleri döndürür.
+
+    Sürüm günlükten düşmüşse veya `epoch` değiştiyse `resync_required: true` döner; istemci
+    `GET /books` ile tam senkron yapıp yanıttaki `version`/`epoch`'tan devam etmelidir.
+    `wait` > 0 ise yeni değişiklik yokken en fazla bu kadar saniye beklenir (long-poll).
+    """
+    feed = _change_feed(since, epoch, limit)
+    if wait and not feed.changes and not feed.resync_required:
+        # Süre dolsa da yeniden okunur: kaçırılan bir bildirim değişikliği gizlemesin
+        await change_notifier.wait(wait)
+        feed = _change_feed(since, epoch, limit)
+    return feed
+
+
+def _sse(event: str, data: str, event_id: Optional[str] = None) -> str:
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {data}\n\n"
+
+
+@app.get("/books/changes/stream", dependencies=[Depends(require_ready)])
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    epoch: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None),
+):
+    """Değişiklikleri Server-Sent Events olarak iter (`id` = `<epoch>:<sürüm>`).
+
+    Yeniden bağlanan istemcinin `Last-Event-ID` başlığı `since`/`epoch` yerine kullanılır;
+    verilmezse akış mevcut sürümden başlar. Günlük kesildiyse veya epoch değiştiyse (ör.
+    sunucu yeniden başladı) `resync` olayı gönderilip akış kapatılır.
+    """
+    cursor = lib.version if since is None else since
+    if last_event_id:
+        last_epoch, _, last_version = last_event_id.rpartition(":")
+        if last_version.isdigit():
+            # Epoch'suz bir kimlik bu sunucuya ait değildir: resync'e düşer
+            cursor, epoch = int(last_version), last_epoch
+    if epoch is None:
+        epoch = lib.changes_epoch
+
+    async def events():
+        nonlocal cursor
+        while not await request.is_disconnected():
+            feed = _change_feed(cursor, epoch, 500)
+            if feed.resync_required:
+                yield _sse("resync", feed.model_dump_json(), f"{feed.epoch}:{feed.version}")
+                return
+            for change in feed.changes:
+                yield _sse("change", change.model_dump_json(), f"{feed.epoch}:{change.version}")
+            cursor = feed.version
+            if feed.has_more:
+                continue
+            if not await change_notifier.wait(15):
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/books/{isbn}", response_model=Book, dependencies=[Depends(require_ready)])
+async def get_book(isbn: str = Depends(isbn_path)):
     book = lib.find_book(isbn)
     if book is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Kitap bulunamadı")
     return book
 
 
-@app.post("/books", response_model=Book, status_code=status.HTTP_201_CREATED)
+@app.post(
+    "/books",
+    response_model=Book,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_ready)],
+)
 async def create_book(body: BookCreate):
     try:
         book = Book(**body.model_dump())
@@ -211,11 +1444,23 @@ async def create_book(body: BookCreate):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@app.post("/books/isbn/{isbn}", response_model=Book, status_code=status.HTTP_201_CREATED)
-async def create_book_by_isbn(isbn: str = FPath(..., min_length=10)):
+@app.post(
+    "/books/isbn/{isbn}",
+    response_model=Book,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_ready)],
+)
+async def create_book_by_isbn(isbn: str = Depends(isbn_path)):
     try:
-        book = lib.add_book_by_isbn(isbn)
+        book = await lib.add_book_by_isbn_async(isbn)
         return book
+    except UpstreamUnavailable as e:
+        retry_after = e.retry_after if e.retry_after is not None else 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
     except ValueError as e:
         # 404 mesajını özel ele alalım
         msg = str(e)
@@ -224,8 +1469,8 @@ async def create_book_by_isbn(isbn: str = FPath(..., min_length=10)):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=msg)
 
 
-@app.put("/books/{isbn}", response_model=Book)
-async def update_book(isbn: str, body: BookUpdate):
+@app.put("/books/{isbn}", response_model=Book, dependencies=[Depends(require_ready)])
+async def update_book(body: BookUpdate, isbn: str = Depends(isbn_path)):
     try:
         updated = lib.update_book(isbn, body)
         return updated
@@ -233,8 +1478,12 @@ async def update_book(isbn: str, body: BookUpdate):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
-@app.delete("/books/{isbn}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_book(isbn: str):
+@app.delete(
+    "/books/{isbn}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(require_ready)],
+)
+async def delete_book(isbn: str = Depends(isbn_path)):
     try:
         lib.remove_book(isbn)
     except ValueError as e:
@@ -0,0 +1,138 @@
+"""
+Stage-3 soğuk başlangıç ölçümü.
+
+Sentetik bir katalog üretir ve şunları ölçer:
+- Library.load_books(): JSON + Pydantic doğrulaması (snapshot yok) vs snapshot'tan yükleme
+- Shard'lı düzen (--shards K): K shard'ın süreç havuzunda paralel yüklenmesi
+- `import app` süresi (ayrı süreçte): eager/json, eager/snapshot ve lazy (LIBRARY_LAZY_LOAD=1)
+
+Kullanım:
+    python bench_startup.py --books 50000 --repeat 3 --shards 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+if str(CURRENT_DIR) not in sys.path:
+    sys.path.insert(0, str(CURRENT_DIR))
+
+# Shard yükleyen "spawn" işçileri bu betiği yeniden import eder; app import edilirken
+# varsayılan kütüphane yüklenmesin (ölçülen import'lar kendi ortamlarıyla çalışır)
+os.environ.setdefault("LIBRARY_LAZY_LOAD", "1")
+
+from app import Library  # noqa: E402
+from storage import _isbn13_check_digit  # noqa: E402
+
+
+def make_catalogue(path: Path, count: int) -> None:
+    rows = []
+    for i in range(count):
+        body = f"978{i:09d}"
+        rows.append({
+            "title": f"Kitap {i}",
+            "author": f"Yazar {i % 997}",
+            "isbn": body + _isbn13_check_digit(body),
+        })
+    path.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def time_load(store: Path, repeat: int, *, with_snapshot: bool) -> float:
+    lib = Library(store)
+
+    def run() -> None:
+        if not with_snapshot:
+            lib.snapshot_path.unlink(missing_ok=True)
+        lib.load_books()
+
+    if with_snapshot:
+        lib.load_books()  # snapshot'ı ısıt
+    return best_of(repeat, run)
+
+
+def time_sharded_load(store: Path, repeat: int, shards: int) -> float:
+    # Taşıma tek dosyayı kenara aldığından diğer ölçümler için kopya üzerinde çalışılır
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / store.name
+        shutil.copyfile(store, copy)
+        lib = Library(copy, shards=shards)
+        lib.load_books()  # tek dosyayı shard'lara taşı
+
+        def run() -> None:
+            for snap in lib.shard_dir.glob("*.snapshot"):
+                snap.unlink()
+            Library(copy, shards=shards).load_books()
+
+        return best_of(repeat, run)
+
+
+def time_import(store: Path, repeat: int, *, lazy: bool, with_snapshot: bool) -> float:
+    env = dict(os.environ, LIBRARY_STORAGE=str(store), LIBRARY_LAZY_LOAD="1" if lazy else "0")
+    cmd = [sys.executable, "-c", "import app"]
+
+    def run() -> None:
+        if not with_snapshot:
+            Library(store).snapshot_path.unlink(missing_ok=True)
+        subprocess.run(cmd, cwd=CURRENT_DIR, env=env, check=True)
+
+    if with_snapshot:
+        Library(store).load_books()
+    return best_of(repeat, run)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Path(tmp) / "library.json"
+        make_catalogue(store, args.books)
+        repeat = args.repeat
+        results = [
+            ("load_books (json + doğrulama)", time_load(store, repeat, with_snapshot=False)),
+            ("load_books (snapshot)", time_load(store, repeat, with_snapshot=True)),
+            (
+                f"load_books ({args.shards} shard, json)",
+                time_sharded_load(store, repeat, args.shards),
+            ),
+            (
+                "import app (eager, json)",
+                time_import(store, repeat, lazy=False, with_snapshot=False),
+            ),
+            (
+                "import app (eager, snapshot)",
+                time_import(store, repeat, lazy=False, with_snapshot=True),
+            ),
+            ("import app (lazy)", time_import(store, repeat, lazy=True, with_snapshot=True)),
+        ]
+
+    print(f"{args.books} kitap, en iyi {args.repeat} ölçüm:")
+    for name, seconds in results:
+        print(f"  {name:<32} {seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
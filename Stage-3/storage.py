@@ -0,0 +1,181 @@
+"""
+Stage-3 depolama yardımcıları: kanonik ISBN, Book modeli, JSON/snapshot okuma-yazma.
+
+Shard'lar süreç havuzunda ("spawn" ile) paralel yüklenir; işçi süreçler yalnızca bu
+modülü import eder. Bu yüzden burada import sırasında yan etki (uygulama kurulumu,
+kitap yükleme) olmamalıdır.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, field_validator
+
+
+SNAPSHOT_VERSION = 2
+
+_ISBN_SEPARATORS = re.compile(r"[\s\-]")
+
+
+def canonical_isbn(isbn: str) -> str:
+    """ISBN'i kanonik 13 haneli biçime getirir.
+
+    Tire/boşluk ayraçları atılır, kontrol hanesi doğrulanır ve ISBN-10 değerleri
+    ISBN-13'e (978 önekiyle) çevrilir. Geçersiz girdide ValueError yükseltir.
+    """
+    digits = _ISBN_SEPARATORS.sub("", str(isbn)).upper()
+    if len(digits) == 10 and digits[:9].isdigit() and (digits[9].isdigit() or digits[9] == "X"):
+        total = sum((10 - i) * int(c) for i, c in enumerate(digits[:9]))
+        total += 10 if digits[9] == "X" else int(digits[9])
+        if total % 11 != 0:
+            raise ValueError(f"Geçersiz ISBN (kontrol hanesi): {isbn}")
+        body = "978" + digits[:9]
+        return body + _isbn13_check_digit(body)
+    if len(digits) == 13 and digits.isdigit():
+        if _isbn13_check_digit(digits[:12]) != digits[12]:
+            raise ValueError(f"Geçersiz ISBN (kontrol hanesi): {isbn}")
+        return digits
+    raise ValueError(f"Geçersiz ISBN: {isbn}")
+
+
+def isbn_key(isbn: str) -> int:
+    """Kanonik ISBN-13'ü birincil indeks anahtarı olarak int'e paketler."""
+    return int(canonical_isbn(isbn))
+
+
+def _isbn13_check_digit(first12: str) -> str:
+    total = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+class Book(BaseModel):
+    title: str = Field(..., min_length=1)
+    author: str = Field(..., min_length=1)
+    isbn: str = Field(..., min_length=10)
+
+    @field_validator("isbn")
+    @classmethod
+    def normalize_isbn(cls, value: str) -> str:
+        return canonical_isbn(value)
+
+
+Row = Tuple[str, str, str]
+
+
+def _snapshot_path(path: Path) -> Path:
+    return path.with_name(path.name + ".snapshot")
+
+
+def _parse_rows(payload: bytes) -> Tuple[List[Row], List[dict]]:
+    """Doğrulanmış satırları ve indekse alınamayan ham kayıtları döndürür."""
+    raw = json.loads(payload.decode("utf-8"))
+    if not isinstance(raw, list):
+        return [], []
+    rows: Dict[int, Row] = {}
+    unindexed = _validate_items(raw, rows)
+    return list(rows.values()), unindexed
+
+
+def _validate_items(items: list, rows: Dict[int, Row]) -> List[dict]:
+    """Kayıtları doğrulayıp `rows`'a ekler; indekse alınamayanları döndürür."""
+    unindexed: List[dict] = []
+    for item in items:
+        try:
+            book = Book(**item)
+        except (TypeError, ValueError):
+            # Geçersiz ISBN'li (veya eksik alanlı) kayıtlar indekse alınamaz; veri kaybı
+            # olmasın diye ham halleriyle saklanır ve kaydetmede aynen geri yazılır
+            unindexed.append(item)
+            continue
+        key = int(book.isbn)
+        if key in rows:
+            unindexed.append(item)
+            continue
+        rows[key] = (book.title, book.author, book.isbn)
+    return unindexed
+
+
+def _snapshot_rows(books: List[Book], unindexed: List[dict]) -> Tuple[List[Row], List[dict]]:
+    """Yazılan dosyanın _parse_rows ile vereceği sonucu bellekteki kitaplardan kurar.
+
+    Kitaplar zaten doğrulanmış olduğundan yalnızca (az sayıdaki) indekse alınamamış
+    kayıtlar yeniden doğrulanır.
+    """
+    rows: Dict[int, Row] = {int(b.isbn): (b.title, b.author, b.isbn) for b in books}
+    skipped = _validate_items(unindexed, rows)
+    return list(rows.values()), skipped
+
+
+def _read_snapshot(path: Path, digest: str) -> Optional[Tuple[List[Row], List[dict]]]:
+    # Snapshot yalnızca bu uygulamanın yazdığı yerel, güvenilir bir dosyadır
+    try:
+        with _snapshot_path(path).open("rb") as fh:
+            snap = pickle.load(fh)
+        if snap.get("version") != SNAPSHOT_VERSION or snap.get("source_sha256") != digest:
+            return None
+        return snap["rows"], snap["unindexed"]
+    except Exception:
+        return None
+
+
+def _write_snapshot(path: Path, digest: str, rows: List[Row], unindexed: List[dict]) -> None:
+    snap = {
+        "version": SNAPSHOT_VERSION,
+        "source_sha256": digest,
+        "rows": rows,
+        "unindexed": unindexed,
+    }
+    target = _snapshot_path(path)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as fh:
+            pickle.dump(snap, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, target)
+    except OSError:
+        # Salt okunur dizin vb.: snapshot yalnızca bir hızlandırmadır
+        tmp.unlink(missing_ok=True)
+
+
+def _load_rows(path: Path) -> Tuple[List[Row], List[dict], str]:
+    """Bir JSON dosyasını doğrulanmış (title, author, isbn) satırlarına çevirir.
+
+    Dosyanın SHA-256 özeti snapshot ile eşleşirse doğrulama atlanır.
+    """
+    payload = path.read_bytes()
+    digest = hashlib.sha256(payload).hexdigest()
+    cached = _read_snapshot(path, digest)
+    if cached is not None:
+        return *cached, "snapshot"
+    rows, unindexed = _parse_rows(payload)
+    _write_snapshot(path, digest, rows, unindexed)
+    return rows, unindexed, "json"
+
+
+def _books_from_rows(chunks: List[List[Row]], unindexed: List[dict]) -> Dict[int, Book]:
+    # Satırlar _load_rows içinde doğrulandı; burada yeniden doğrulama yapılmaz.
+    # Farklı dosyalarda yinelenen anahtarlar da silinmesin diye unindexed'e eklenir.
+    books: Dict[int, Book] = {}
+    for rows in chunks:
+        for title, author, isbn in rows:
+            key = int(isbn)
+            if key in books:
+                unindexed.append({"title": title, "author": author, "isbn": isbn})
+                continue
+            books[key] = Book.model_construct(title=title, author=author, isbn=isbn)
+    return books
+
+
+def _write_json_atomic(path: Path, data) -> bytes:
+    """JSON'u geçici dosya üzerinden atomik yazar; yazılan baytları döndürür."""
+    payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+    return payload
@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 import sys
 
@@ -5,8 +6,11 @@ CURRENT_DIR = Path(__file__).parent
 if str(CURRENT_DIR) not in sys.path:
     sys.path.insert(0, str(CURRENT_DIR))
 
+import pytest
 from fastapi.testclient import TestClient  # type: ignore
 
+import app as app_module
+import storage
 from app import app, storage_file, lib
 
 
@@ -50,3 +54,565 @@ def test_crud_flow():
     assert r.status_code == 404
 
 
+class MockResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+
+def _fast_policy(sleeps):
+    return app_module.RetryPolicy(max_retries=2, sleep=sleeps.append, rng=lambda: 0.5)
+
+
+def test_upstream_retries_and_honors_retry_after(monkeypatch):
+    responses = [
+        MockResponse(503, headers={"Retry-After": "1"}),
+        MockResponse(200, {"title": "Dune", "by_statement": "Frank Herbert"}),
+    ]
+
+    def fake_get(url, timeout=10, headers=None):
+        return responses.pop(0)
+
+    monkeypatch.setattr(app_module.httpx, "get", fake_get)
+    sleeps = []
+    title, authors = app_module.fetch_book_metadata(
+        "9780441013593",
+        breaker=app_module.CircuitBreaker(),
+        policy=_fast_policy(sleeps),
+    )
+    assert (title, authors) == ("Dune", ["Frank Herbert"])
+    assert sleeps == [1.0]
+
+
+def test_circuit_breaker_fails_fast(monkeypatch):
+    calls = {"count": 0}
+
+    def fake_get(url, timeout=10, headers=None):
+        calls["count"] += 1
+        raise app_module.httpx.ConnectError("down")
+
+    monkeypatch.setattr(app_module.httpx, "get", fake_get)
+    breaker = app_module.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    with pytest.raises(app_module.UpstreamUnavailable):
+        app_module.fetch_book_metadata("9780441013593", breaker=breaker, policy=_fast_policy([]))
+    assert breaker.state == "open"
+    assert calls["count"] == 2
+
+    with pytest.raises(app_module.UpstreamUnavailable):
+        app_module.fetch_book_metadata("9780441013593", breaker=breaker, policy=_fast_policy([]))
+    assert calls["count"] == 2
+
+
+def test_exhausted_retries_return_503_with_upstream_retry_after(monkeypatch):
+    def fake_get(url, timeout=10, headers=None):
+        return MockResponse(503, headers={"Retry-After": "7"})
+
+    monkeypatch.setattr(app_module.httpx, "get", fake_get)
+    breaker = app_module.CircuitBreaker(failure_threshold=100)
+    monkeypatch.setattr(app_module, "upstream_breaker", breaker)
+    monkeypatch.setattr(app_module, "upstream_retry", _fast_policy([]))
+    r = client.post("/books/isbn/9780441013593")
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "7"
+
+    def failing_get(url, timeout=10, headers=None):
+        raise app_module.httpx.ConnectError("down")
+
+    monkeypatch.setattr(app_module.httpx, "get", failing_get)
+    r = client.post("/books/isbn/9780441013593")
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+
+
+def test_half_open_probe_is_released_on_unexpected_error(monkeypatch):
+    now = {"t": 0.0}
+    breaker = app_module.CircuitBreaker(
+        failure_threshold=1, reset_timeout=10, clock=lambda: now["t"]
+    )
+    breaker.record_failure()
+    now["t"] = 10.0
+    assert breaker.state == "half-open"
+
+    def bad_redirect(url, timeout=10, headers=None):
+        raise app_module.httpx.InvalidURL("bozuk adres")
+
+    monkeypatch.setattr(app_module.httpx, "get", bad_redirect)
+    with pytest.raises(app_module.UpstreamUnavailable):
+        app_module.fetch_book_metadata("9780441013593", breaker=breaker, policy=_fast_policy([]))
+    # Deneme başarısız sayıldı: devre yeniden açılır ve süre dolunca yeni denemeye izin verir
+    assert breaker.state == "open"
+    now["t"] = 20.0
+    assert breaker.state == "half-open"
+
+    # Süre bütçesi bitmiş bir istek deneme hakkını tüketmez
+    with pytest.raises(app_module.UpstreamUnavailable):
+        app_module.fetch_book_metadata(
+            "9780441013593",
+            deadline=app_module.Deadline(0),
+            breaker=breaker,
+            policy=_fast_policy([]),
+        )
+    assert breaker.allow() is True
+
+
+def test_author_lookup_degrades_to_by_statement_when_deadline_runs_out(monkeypatch):
+    now = {"t": 0.0}
+
+    def fake_get(url, timeout=10, headers=None):
+        now["t"] += 3.0
+        if "/isbn/" in url:
+            return MockResponse(
+                200,
+                {
+                    "title": "Good Omens",
+                    "authors": [{"key": "/authors/OL1A"}, {"key": "/authors/OL2A"}],
+                    "by_statement": "Terry Pratchett & Neil Gaiman",
+                },
+            )
+        return MockResponse(200, {"name": "Terry Pratchett"})
+
+    monkeypatch.setattr(app_module.httpx, "get", fake_get)
+    deadline = app_module.Deadline(5.0, clock=lambda: now["t"])
+    title, authors = app_module.fetch_book_metadata(
+        "9780060853983",
+        deadline=deadline,
+        breaker=app_module.CircuitBreaker(),
+        policy=_fast_policy([]),
+    )
+    assert title == "Good Omens"
+    assert authors == ["Terry Pratchett & Neil Gaiman"]
+
+
+def test_isbn_routes_are_canonical():
+    payload = {"title": "Dune", "author": "Frank Herbert", "isbn": "978-0-441-01359-3"}
+    r = client.post("/books", json=payload)
+    assert r.status_code == 201
+    assert r.json()["isbn"] == "9780441013593"
+
+    # ISBN-10 ve tireli biçim aynı kitabı gösterir
+    assert client.get("/books/0441013597").json()["title"] == "Dune"
+    assert client.post("/books", json={**payload, "isbn": "0441013597"}).status_code == 400
+    assert client.post("/books/isbn/0441013597").status_code == 400
+    assert client.get("/books/9780441013594").status_code == 400
+
+    assert client.delete("/books/0-441-01359-7").status_code == 204
+
+
+def test_invalid_isbn_records_are_kept_on_save(tmp_path: Path):
+    store = tmp_path / "lib.json"
+    good = {"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593"}
+    bad = {"title": "Bozuk", "author": "X", "isbn": "123"}
+    dup = {"title": "Dune (kopya)", "author": "Frank Herbert", "isbn": "0441013597"}
+    store.write_text(json.dumps([good, bad, dup]), encoding="utf-8")
+
+    library = app_module.Library(store)
+    library.load_books()
+    assert [b.title for b in library.list_books()] == ["Dune"]
+    assert library.unindexed_records == [bad, dup]
+    assert library.load_stats["unindexed"] == 2
+
+    library.add_book(app_module.Book(title="1984", author="George Orwell", isbn="9780451524935"))
+    saved = json.loads(store.read_text(encoding="utf-8"))
+    assert bad in saved and dup in saved
+
+    # Shard'lara taşınınca shard 0'a yazılır ve snapshot'tan da geri okunur
+    for _ in range(2):
+        sharded = app_module.Library(store, shards=2)
+        sharded.load_books()
+        assert [r["title"] for r in sharded.unindexed_records] == ["Bozuk", "Dune (kopya)"]
+        assert sorted(b.title for b in sharded.list_books()) == ["1984", "Dune"]
+    shard0 = json.loads((sharded.shard_dir / "shard-000-of-002.json").read_text(encoding="utf-8"))
+    assert bad in shard0
+
+
+def test_snapshot_skips_revalidation_until_source_changes(tmp_path: Path, monkeypatch):
+    store = tmp_path / "lib.json"
+    store.write_text(
+        '[{"title": "Dune", "author": "Frank Herbert", "isbn": "978-0441013593"}]',
+        encoding="utf-8",
+    )
+    first = app_module.Library(store)
+    first.load_books()
+    assert first.load_stats["source"] == "json"
+    assert first.snapshot_path.exists()
+
+    def no_validation(payload):
+        raise AssertionError("snapshot yolunda doğrulama yapılmamalı")
+
+    monkeypatch.setattr(storage, "_parse_rows", no_validation)
+    second = app_module.Library(store)
+    second.load_books()
+    assert second.load_stats["source"] == "snapshot"
+    assert second.find_book("0441013597").title == "Dune"
+
+    # Kaydetme snapshot'ı bellekteki satırlardan tazeler: yeniden başlatma doğrulamayı atlar
+    second.add_book(app_module.Book(title="1984", author="George Orwell", isbn="9780451524935"))
+    third = app_module.Library(store)
+    third.load_books()
+    assert third.load_stats["source"] == "snapshot"
+    assert [b.title for b in third.list_books()] == ["Dune", "1984"]
+    monkeypatch.undo()
+
+    # Dosya dışarıdan değişirse özet tutmaz ve yeniden doğrulanır
+    store.write_text(store.read_text(encoding="utf-8").replace("1984", "Animal Farm"), "utf-8")
+    fourth = app_module.Library(store)
+    fourth.load_books()
+    assert fourth.load_stats["source"] == "json"
+    assert fourth.find_book("9780451524935").title == "Animal Farm"
+
+
+def test_lazy_load_in_lifespan_reports_readiness(tmp_path: Path, monkeypatch):
+    lazy_lib = app_module.Library(tmp_path / "lib.json")
+    monkeypatch.setattr(app_module, "lib", lazy_lib)
+
+    assert client.get("/ready").status_code == 503
+    assert client.get("/books").status_code == 503
+
+    with TestClient(app):
+        pass
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["status"] == "ready"
+    assert client.get("/books").status_code == 200
+
+
+def test_profiling_middleware_profiles_selected_requests(tmp_path: Path):
+    profiled = TestClient(
+        app_module.ProfilingMiddleware(app, profile_dir=tmp_path, token="gizli", max_files=2)
+    )
+
+    r = profiled.get("/books")
+    assert "server-timing" not in r.headers
+    # Token'sız veya yanlış token'lı başlık profillemeyi tetiklemez
+    assert "server-timing" not in profiled.get("/books", headers={"X-Profile": "1"}).headers
+
+    payload = {"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593"}
+    r = profiled.post("/books", json=payload, headers={"X-Profile": "gizli"})
+    assert r.status_code == 201
+    assert "storage;dur=" in r.headers["server-timing"]
+    assert "total;dur=" in r.headers["server-timing"]
+    assert (tmp_path / r.headers["x-profile-file"]).exists()
+
+    # Dosya adları benzersizdir ve en fazla max_files profil tutulur
+    names = [
+        profiled.get("/books", headers={"X-Profile": "gizli"}).headers["x-profile-file"]
+        for _ in range(3)
+    ]
+    assert len(set(names)) == 3
+    assert sorted(p.name for p in tmp_path.glob("*.prof")) == names[-2:]
+
+    assert profiled.delete("/books/9780441013593").status_code == 204
+
+
+def test_list_books_sort_and_filter(tmp_path: Path):
+    library = app_module.Library(tmp_path / "lib.json")
+    for title, author, isbn in [
+        ("Dune", "Frank Herbert", "9780441013593"),
+        ("1984", "George Orwell", "9780451524935"),
+        ("The Hobbit", "J.R.R. Tolkien", "9780345339683"),
+        ("Animal Farm", "George Orwell", "9780451526342"),
+        ("Ulysses", "James Joyce", "9780199535675"),
+    ]:
+        library.add_book(app_module.Book(title=title, author=author, isbn=isbn))
+
+    def titles(**kwargs):
+        return [b.title for b in library.query_books(**kwargs)]
+
+    assert titles(limit=2) == ["Dune", "1984"]
+    assert titles(sort="title") == ["1984", "Animal Farm", "Dune", "The Hobbit", "Ulysses"]
+    assert titles(sort="title", descending=True, skip=1, limit=2) == ["The Hobbit", "Dune"]
+    assert titles(sort="isbn", limit=1) == ["Ulysses"]
+    assert titles(author="george orwell") == ["1984", "Animal Farm"]
+    assert titles(author="George Orwell", sort="title", descending=True) == ["Animal Farm", "1984"]
+    assert titles(title_prefix="the") == ["The Hobbit"]
+    assert titles(author="George Orwell", title_prefix="an") == ["Animal Farm"]
+
+    library.update_book("9780441013593", app_module.BookUpdate(title="Children of Dune"))
+    library.remove_book("9780451524935")
+    assert titles(sort="title") == ["Animal Farm", "Children of Dune", "The Hobbit", "Ulysses"]
+    assert titles(sort="author", limit=2) == ["Children of Dune", "Animal Farm"]
+
+    reloaded = app_module.Library(tmp_path / "lib.json")
+    reloaded.load_books()
+    assert [b.title for b in reloaded.query_books(title_prefix="u")] == ["Ulysses"]
+
+
+def test_list_books_query_params():
+    r = client.get("/books", params={"sort": "title", "order": "desc", "author": "x"})
+    assert r.status_code == 200
+    assert client.get("/books", params={"sort": "year"}).status_code == 422
+
+
+def test_sharded_storage_writes_one_shard_and_rebalances(tmp_path: Path, monkeypatch):
+    store = tmp_path / "lib.json"
+    store.write_text(
+        '[{"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593"},'
+        ' {"title": "1984", "author": "George Orwell", "isbn": "9780451524935"}]',
+        encoding="utf-8",
+    )
+    library = app_module.Library(store, shards=4)
+    library.load_books()
+    # Tek dosya shard'lara taşınır
+    assert sorted(p.name for p in library.shard_dir.glob("shard-*.json")) == [
+        f"shard-{i:03d}-of-004.json" for i in range(4)
+    ]
+    assert not store.exists() and store.with_name("lib.json.migrated").exists()
+    # Shard sayısı verilmese de diskteki shard'lı düzen kullanılır
+    unsharded = app_module.Library(store)
+    unsharded.load_books()
+    assert (unsharded.shards, len(unsharded.list_books())) == (4, 2)
+
+    written = []
+    write_json = app_module._write_json_atomic
+
+    def recording_write(path, data):
+        written.append(path.name)
+        return write_json(path, data)
+
+    monkeypatch.setattr(app_module, "_write_json_atomic", recording_write)
+    hobbit = app_module.Book(title="The Hobbit", author="J.R.R. Tolkien", isbn="9780345339683")
+    library.add_book(hobbit)
+    assert written == [f"shard-{app_module.isbn_key(hobbit.isbn) % 4:03d}-of-004.json"]
+    monkeypatch.setattr(app_module, "_write_json_atomic", write_json)
+
+    library.rebalance(2)
+    assert sorted(p.name for p in library.shard_dir.glob("shard-*.json")) == [
+        "shard-000-of-002.json",
+        "shard-001-of-002.json",
+    ]
+
+    # Farklı shard sayısıyla açılınca paralel yüklenir ve yeniden dağıtılır
+    monkeypatch.setattr(app_module, "PARALLEL_LOAD_MIN_BYTES", 0)
+    reloaded = app_module.Library(store, shards=3, load_workers=2)
+    reloaded.load_books()
+    assert reloaded.load_stats["parallel"] is True
+    assert reloaded.load_stats["shards"] == 2
+    assert [b.title for b in reloaded.query_books(sort="title")] == ["1984", "Dune", "The Hobbit"]
+    assert len(list(reloaded.shard_dir.glob("shard-*-of-003.json"))) == 3
+    assert not list(reloaded.shard_dir.glob("shard-*-of-002.json*"))
+
+
+def test_corrupt_shard_fails_the_load_and_blocks_writes(tmp_path: Path, monkeypatch):
+    store = tmp_path / "lib.json"
+    rows = []
+    for i in range(40):
+        body = f"978{i:09d}"
+        isbn = body + storage._isbn13_check_digit(body)
+        rows.append({"title": f"Kitap {i}", "author": "Yazar", "isbn": isbn})
+    store.write_text(json.dumps(rows), encoding="utf-8")
+    app_module.Library(store, shards=4).load_books()
+
+    library = app_module.Library(store, shards=4)
+    shard3 = library._shard_path(3, 4)
+    shard3.write_text(shard3.read_text(encoding="utf-8")[:50], encoding="utf-8")
+    before = {p.name: p.read_bytes() for p in library.shard_dir.iterdir()}
+
+    library.load_books()
+    assert library.loaded is False
+    assert library.load_stats["source"] == "failed"
+    with pytest.raises(RuntimeError):
+        library.add_book(app_module.Book(title="Yeni", author="Yazar", isbn="9780441013593"))
+    with pytest.raises(RuntimeError):
+        library.rebalance(2)
+    assert {p.name: p.read_bytes() for p in library.shard_dir.iterdir()} == before
+
+    monkeypatch.setattr(app_module, "lib", library)
+    r = client.get("/ready")
+    assert r.status_code == 503 and r.json()["status"] == "failed"
+    assert client.get("/books").status_code == 503
+
+
+def test_changes_since_and_truncation(tmp_path: Path):
+    library = app_module.Library(tmp_path / "lib.json", changelog_size=3)
+    library.add_book(app_module.Book(title="Dune", author="Frank Herbert", isbn="9780441013593"))
+    library.add_book(app_module.Book(title="1984", author="George Orwell", isbn="9780451524935"))
+    library.update_book("9780441013593", app_module.BookUpdate(title="Children of Dune"))
+
+    changes = library.changes_since(1)
+    assert [(c.version, c.op) for c in changes] == [(2, "add"), (3, "update")]
+    assert changes[1].book.title == "Children of Dune"
+    assert library.changes_since(3) == []
+
+    library.remove_book("9780451524935")
+    assert library.changes_since(0) is None
+    assert [c.op for c in library.changes_since(1)] == ["add", "update", "remove"]
+    assert library.changes_since(99) is None
+
+
+def test_changes_endpoint_long_poll_and_resync():
+    import threading
+
+    since, epoch = lib.version, lib.changes_epoch
+    r = client.get("/books/changes", params={"since": 0, "limit": 1})
+    assert r.status_code == 200
+    assert r.json()["epoch"] == epoch
+
+    r = client.get("/books/changes", params={"since": since, "wait": 0.05})
+    assert r.json()["changes"] == []
+
+    payload = {"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593"}
+    timer = threading.Timer(0.1, lambda: lib.add_book(app_module.Book(**payload)))
+    timer.start()
+    r = client.get("/books/changes", params={"since": since, "epoch": epoch, "wait": 5})
+    timer.join()
+    feed = r.json()
+    assert [c["op"] for c in feed["changes"]] == ["add"]
+    assert feed["version"] == since + 1
+
+    assert client.delete("/books/9780441013593").status_code == 204
+    r = client.get("/books/changes", params={"since": since, "epoch": "stale"})
+    assert r.json()["resync_required"] is True
+
+    with client.stream("GET", "/books/changes/stream", params={"since": 10**9}) as stream:
+        body = "".join(stream.iter_text())
+    assert "event: resync" in body
+    assert f"id: {lib.changes_epoch}:{lib.version}" in body
+
+    # Başka bir epoch'tan (ör. yeniden başlatma öncesi) gelen Last-Event-ID resync alır
+    headers = {"Last-Event-ID": f"stale:{lib.version}"}
+    with client.stream("GET", "/books/changes/stream", headers=headers) as stream:
+        assert "event: resync" in "".join(stream.iter_text())
+
+
+def test_long_poll_rereads_feed_when_notification_is_missed(monkeypatch):
+    since = lib.version
+
+    async def missed_wait(timeout):
+        # Değişiklik bildirim kaydından önce olmuş gibi: wait süre dolunca döner
+        lib.add_book(app_module.Book(title="Dune", author="Frank Herbert", isbn="9780441013593"))
+        return False
+
+    monkeypatch.setattr(app_module.change_notifier, "wait", missed_wait)
+    r = client.get("/books/changes", params={"since": since, "wait": 1})
+    assert [c["op"] for c in r.json()["changes"]] == ["add"]
+    assert client.delete("/books/9780441013593").status_code == 204
+
+
+def test_admission_rate_limit_per_client():
+    now = {"t": 0.0}
+    limited = TestClient(
+        app_module.AdmissionControlMiddleware(
+            app, rate=1.0, burst=2, api_keys={"mirror"}, clock=lambda: now["t"]
+        )
+    )
+    assert limited.get("/books").status_code == 200
+    assert limited.get("/books").status_code == 200
+    r = limited.get("/books")
+    assert r.status_code == 429
+    assert r.headers["retry-after"] == "1"
+
+    # Sağlık kontrolleri ve farklı istemci anahtarları etkilenmez
+    assert limited.get("/ready").status_code == 200
+    assert limited.get("/books", headers={"X-API-Key": "mirror"}).status_code == 200
+    # Bilinmeyen anahtarlar IP kovasına düşer: anahtar değiştirerek sınır aşılamaz
+    assert limited.get("/books", headers={"X-API-Key": "uydurma-1"}).status_code == 429
+    assert limited.get("/books", headers={"X-API-Key": "uydurma-2"}).status_code == 429
+
+    now["t"] += 1.0
+    assert limited.get("/books").status_code == 200
+
+
+def test_concurrency_limiter_sheds_when_queue_is_full():
+    import asyncio
+
+    async def scenario():
+        limiter = app_module.ConcurrencyLimiter(limit=1, max_queue=1, queue_timeout=1.0)
+        assert await limiter.acquire()
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        assert await limiter.acquire() is False
+
+        limiter.release()
+        assert await queued is True
+        assert limiter.active == 1
+
+        short = app_module.ConcurrencyLimiter(limit=1, max_queue=1, queue_timeout=0.01)
+        await short.acquire()
+        assert await short.acquire() is False
+        short.release()
+        assert short.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_upstream_route_classification():
+    assert app_module.admission_class("POST", "/books/isbn/9780441013593") == "upstream"
+    assert app_module.admission_class("GET", "/books/9780441013593") == "local"
+    assert app_module.admission_class("GET", "/books/changes") == ""
+    assert app_module.admission_class("GET", "/ready") is None
+
+
+def test_create_book_by_isbn_fetches_off_the_event_loop(monkeypatch):
+    import asyncio
+
+    on_loop = []
+
+    def fake_fetch(isbn, *, user_agent=app_module.DEFAULT_UA):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return "Dune", ["Frank Herbert"]
+
+    monkeypatch.setattr(app_module, "fetch_book_metadata", fake_fetch)
+    r = client.post("/books/isbn/0441013597")
+    assert r.status_code == 201
+    assert r.json() == {"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593"}
+    assert on_loop == [False]
+    assert client.post("/books/isbn/9780441013593").status_code == 400
+    assert client.delete("/books/9780441013593").status_code == 204
+
+
+def test_concurrent_imports_of_same_isbn_share_one_upstream_call(tmp_path: Path, monkeypatch):
+    import asyncio
+    import threading
+
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch(isbn, *, user_agent=app_module.DEFAULT_UA):
+        calls.append(isbn)
+        release.wait(5)
+        return "Dune", ["Frank Herbert"]
+
+    monkeypatch.setattr(app_module, "fetch_book_metadata", slow_fetch)
+    library = app_module.Library(tmp_path / "lib.json")
+
+    async def run():
+        tasks = [
+            asyncio.create_task(library.add_book_by_isbn_async(isbn))
+            for isbn in ("9780441013593", "0441013597", "978-0-441-01359-3")
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert calls == ["9780441013593"]
+    assert results[0].title == "Dune"
+    assert all(isinstance(r, ValueError) for r in results[1:])
+    assert len(library.list_books()) == 1
+
+
+def test_profiled_isbn_import_includes_worker_thread_work(tmp_path: Path, monkeypatch):
+    import pstats
+
+    def fake_get(url, timeout=10, headers=None):
+        return MockResponse(200, {"title": "Dune", "by_statement": "Frank Herbert"})
+
+    monkeypatch.setattr(app_module.httpx, "get", fake_get)
+    monkeypatch.setattr(app_module, "upstream_breaker", app_module.CircuitBreaker())
+    profiled = TestClient(app_module.ProfilingMiddleware(app, profile_dir=tmp_path, token="gizli"))
+
+    r = profiled.post("/books/isbn/9780441013593", headers={"X-Profile": "gizli"})
+    assert r.status_code == 201
+    stats = pstats.Stats(str(tmp_path / r.headers["x-profile-file"]))
+    functions = {name for _, _, name in stats.stats}
+    assert {"fetch_book_metadata", "upstream_get"} <= functions
+    assert client.delete("/books/9780441013593").status_code == 204